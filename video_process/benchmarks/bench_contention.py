@@ -0,0 +1,126 @@
+"""
+Aggregate throughput of several concurrent video sessions on one machine, with and without the thread budget.
+
+Every session is a separate process analyzing the same synthetic frames (see bench_pipeline.py) as fast as it can.
+All sessions start together, and the script reports the fps of each session, the aggregate fps and the involuntary
+context switches, first with every library sizing its thread pools to the whole machine (what happens without a
+budget) and then with the cores divided between the sessions by `ThreadBudget`. Run it from the application root
+(the directory containing `modules/` and `loggers/`):
+
+    python video_process/benchmarks/bench_contention.py --face-image images/front_side1.png --sessions 1 2 4 8 \
+        --frames 100 --pin --json contention.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+
+def _session(index, budget, args, barrier, results):
+    """
+    Runs one session in its own process and puts its fps and context switches on `results`.
+    """
+    # The budget must be in place before anything loads a model
+    from modules.voice_bot.video_process.thread_budget import set_thread_budget
+    set_thread_budget(budget, session_index=index)
+
+    import cv2
+    from bench_pipeline import synthetic_frames
+    from modules.voice_bot.video_process.analyzer_schedule import AnalyzerSchedule
+    from modules.voice_bot.video_process.detect_face import known_image_encoding
+    from modules.voice_bot.video_process.interview_video import ANALYZERS, VideoProcessor
+
+    width, height = (int(value) for value in args.resolution.lower().split("x"))
+    face_image = cv2.imread(args.face_image)
+    frames = synthetic_frames(width, height, args.faces, face_image, args.frames + args.warmup, seed=index)
+
+    async def run():
+        image_encoding = await known_image_encoding(args.face_image, use_cache=False)
+        schedule = AnalyzerSchedule({name: None for name in ANALYZERS} if args.every_frame else None)
+        # Every frame is analyzed, so the sessions compete for the cores the whole time
+        processor = VideoProcessor(schedule=schedule, motion_gate=False)
+        try:
+            for frame_index, frame in enumerate(frames[:args.warmup]):
+                await processor.analyze_frame(image_encoding, frame, frame_index / 30)
+            barrier.wait()
+            switches = resource.getrusage(resource.RUSAGE_SELF).ru_nivcsw
+            start = time.perf_counter()
+            for frame_index, frame in enumerate(frames[args.warmup:], start=args.warmup):
+                await processor.analyze_frame(image_encoding, frame, frame_index / 30)
+            seconds = time.perf_counter() - start
+            switches = resource.getrusage(resource.RUSAGE_SELF).ru_nivcsw - switches
+        finally:
+            processor.close()
+        return {"fps": args.frames / seconds if seconds > 0 else 0.0, "context_switches": switches}
+
+    results.put(asyncio.run(run()))
+
+
+def run_sessions(sessions, budgeted, args):
+    """
+    Runs `sessions` concurrent sessions and returns their aggregate results.
+    """
+    from modules.voice_bot.video_process.thread_budget import ThreadBudget, available_cores
+
+    if budgeted:
+        budget = ThreadBudget(sessions=sessions, pin=args.pin)
+    else:
+        # What every session does on its own: 8 analyzer threads and library pools as large as the machine
+        budget = ThreadBudget(sessions=1, analyzer_workers=8, library_threads=len(available_cores()))
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(sessions)
+    results = context.Queue()
+    processes = [context.Process(target=_session, args=(index, budget, args, barrier, results))
+                 for index in range(sessions)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        "sessions": sessions,
+        "budget": budgeted,
+        "analyzer_workers": budget.analyzer_workers,
+        "library_threads": budget.library_threads,
+        "session_fps": [outcome["fps"] for outcome in outcomes],
+        "aggregate_fps": sum(outcome["fps"] for outcome in outcomes),
+        "context_switches": sum(outcome["context_switches"] for outcome in outcomes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--face-image", required=True, help="face picture pasted into the frames, also the known face")
+    parser.add_argument("--sessions", type=int, nargs="*", default=[1, 2, 4],
+                        help="numbers of concurrent sessions to run (default: 1 2 4)")
+    parser.add_argument("--resolution", default="640x480", help="frame size as WIDTHxHEIGHT (default: 640x480)")
+    parser.add_argument("--faces", type=int, default=1, help="faces per frame (default: 1)")
+    parser.add_argument("--frames", type=int, default=100, help="measured frames per session (default: 100)")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured frames per session (default: 5)")
+    parser.add_argument("--every-frame", action="store_true",
+                        help="run every analyzer on every frame instead of the default schedule")
+    parser.add_argument("--pin", action="store_true", help="pin each budgeted session to its own cores")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for sessions in args.sessions:
+        for budgeted in (False, True):
+            result = run_sessions(sessions, budgeted, args)
+            results.append(result)
+            label = "budget" if budgeted else "no budget"
+            print(f"{sessions} sessions, {label:<9}: {result['aggregate_fps']:7.1f} fps aggregate, "
+                  f"{min(result['session_fps']):6.1f} fps slowest session, "
+                  f"{result['context_switches']} involuntary context switches")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"cores": os.cpu_count(), "pin": args.pin, "runs": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Face detection benchmark: accuracy versus latency of downscaled and region-of-interest detection.
+
+The full-resolution dlib HOG detector is the reference. For every configuration the script reports the median and
+p95 detection latency, the speedup over the reference, the recall of the reference faces (IoU >= 0.5) and the mean
+IoU of the matched faces. Run it from the application root on a recorded interview:
+
+    python video_process/benchmarks/bench_detection.py interview.mp4 --scales 1 0.75 0.5 0.35 --json detection.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+from modules.voice_bot.video_process.face_detection import ScaledFaceDetector
+
+
+def read_frames(video_path, max_frames, resize_width=None):
+    """
+    Reads up to `max_frames` grayscale frames of a video, optionally resized to `resize_width`.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if resize_width:
+            height, width = frame.shape[:2]
+            frame = cv2.resize(frame, (resize_width, int(height * resize_width / width)))
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    cap.release()
+    return frames
+
+
+def iou(a, b):
+    """
+    Returns the intersection over union of two dlib rectangles.
+    """
+    left, top = max(a.left(), b.left()), max(a.top(), b.top())
+    right, bottom = min(a.right(), b.right()), min(a.bottom(), b.bottom())
+    intersection = max(right - left, 0) * max(bottom - top, 0)
+    union = a.area() + b.area() - intersection
+    return intersection / union if union else 0.0
+
+
+def run(detect, frames):
+    """
+    Runs a detector over every frame and returns the rectangles and latencies in milliseconds.
+    """
+    detections = []
+    latencies = []
+    for gray in frames:
+        start = time.perf_counter()
+        faces = detect(gray)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(list(faces))
+    return detections, latencies
+
+
+def score(reference, detections):
+    """
+    Compares detections with the reference detections: recall at IoU >= 0.5 and mean IoU of the matches.
+    """
+    matched = []
+    total = 0
+    for expected, found in zip(reference, detections):
+        total += len(expected)
+        for face in expected:
+            best = max((iou(face, candidate) for candidate in found), default=0.0)
+            if best >= 0.5:
+                matched.append(best)
+    return {
+        "recall": len(matched) / total if total else 1.0,
+        "mean_iou": statistics.mean(matched) if matched else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("video", help="recorded interview video")
+    parser.add_argument("--frames", type=int, default=300, help="frames to process (default: 300)")
+    parser.add_argument("--width", type=int, help="resize frames to this width first, e.g. 1280 for HD")
+    parser.add_argument("--scales", type=float, nargs="*", default=[1.0, 0.75, 0.5, 0.35],
+                        help="detection scales to compare")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.width)
+    if not frames:
+        parser.error(f"no frames could be read from {args.video}")
+    detector = dlib.get_frontal_face_detector()
+    detector(frames[0])
+
+    reference, reference_latencies = run(detector, frames)
+    reference_median = statistics.median(reference_latencies)
+    height, width = frames[0].shape
+    print(f"{len(frames)} frames of {width}x{height}, "
+          f"{sum(map(len, reference)) / len(frames):.2f} faces per frame")
+
+    results = []
+    for scale in args.scales:
+        for roi in (False, True):
+            detections, latencies = run(ScaledFaceDetector(detector, scale=scale, roi=roi), frames)
+            median = statistics.median(latencies)
+            result = {
+                "scale": scale,
+                "roi": roi,
+                "median_ms": median,
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "speedup": reference_median / median if median else float("inf"),
+                **score(reference, detections),
+            }
+            results.append(result)
+            print(f"scale {scale:<5} roi {str(roi):<5} {median:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+                  f"x{result['speedup']:5.2f}  recall {result['recall']:.3f}  IoU {result['mean_iou']:.3f}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"frames": len(frames), "width": width, "height": height,
+                       "reference_median_ms": reference_median, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
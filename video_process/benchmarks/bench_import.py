@@ -0,0 +1,110 @@
+"""
+Import-time benchmark for the video_process package.
+
+Every module is imported in a fresh interpreter so the numbers match what a newly started worker pays. The script
+reports the wall time of the import, the modules imported by it that are known to be heavy, and the resident memory
+after the import. Run it from the application root (the directory containing `modules/` and `loggers/`):
+
+    python video_process/benchmarks/bench_import.py --repeat 5 --json import_times.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+PACKAGE = "modules.voice_bot.video_process"
+
+MODULES = [
+    "interview_video",
+    "video_processing",
+    "offline_video",
+    "segment_video",
+    "model_registry",
+    "frame_context",
+    "face_detection",
+    "eye_blink",
+    "gaze",
+    "mouth_blink",
+    "headpose",
+    "emotion",
+    "detect_face",
+    "detect_object",
+    "body_postures",
+]
+
+HEAVY_MODULES = [
+    "tensorflow",
+    "keras",
+    "torch",
+    "ultralytics",
+    "mediapipe",
+    "dlib",
+    "face_recognition",
+    "scipy",
+    "keyboard",
+]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def measure(module, repeat):
+    """
+    Imports `module` in `repeat` fresh interpreters and returns the median import time and the last probe result.
+    """
+    samples = []
+    probe = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"module": module, "error": completed.stderr.strip().splitlines()[-1:]}
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+    return {
+        "module": module,
+        "median_seconds": statistics.median(samples),
+        "max_seconds": max(samples),
+        "heavy_imports": probe["heavy"],
+        "max_rss_mb": probe["max_rss_mb"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="fresh interpreters per module (default: 3)")
+    parser.add_argument("--modules", nargs="*", default=MODULES,
+                        help="modules of the package to measure")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = [measure(f"{PACKAGE}.{name}", args.repeat) for name in args.modules]
+    for result in results:
+        if "error" in result:
+            print(f"{result['module']:<55} ERROR {' '.join(result['error'])}")
+            continue
+        heavy = ", ".join(result["heavy_imports"]) or "-"
+        print(f"{result['module']:<55} {result['median_seconds'] * 1000:8.1f} ms "
+              f"{result['max_rss_mb']:8.1f} MB  heavy: {heavy}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+End-to-end and per-analyzer benchmark of the video pipeline, with no camera and no network.
+
+Frames are either synthetic (a background with `--faces` copies of a face image pasted on it, at every resolution of
+`--resolutions`) or read from short recorded clips given with `--clips`. No face image or clip ships with the
+repository (interview footage is not committed); without `--face-image` only the face-free workloads run. Each
+workload is run through `VideoProcessor.analyze_frame` and the script reports the p50/p95/p99 latency of every
+analyzer, of the shared frame context (detection and landmarks) and of the whole frame, the end-to-end fps and the
+peak RSS. Run it from the application root (the directory containing `modules/` and `loggers/`):
+
+    python video_process/benchmarks/bench_pipeline.py --face-image images/front_side1.png \
+        --resolutions 640x480 1280x720 --faces 0 1 2 --frames 200 --json pipeline.json
+
+Compare two result files to catch regressions with `--baseline previous.json`.
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from modules.voice_bot.video_process.analyzer_schedule import AnalyzerSchedule
+from modules.voice_bot.video_process.detect_face import known_image_encoding
+from modules.voice_bot.video_process.interview_video import ANALYZERS, VideoProcessor
+
+
+def synthetic_frames(width, height, faces, face_image=None, count=100, seed=0):
+    """
+    Builds `count` frames of `width` x `height` with `faces` copies of `face_image` laid out side by side on a noisy
+    background. The faces move by a few pixels per frame so trackers and ROI detection see motion.
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(90, 140, size=(height, width, 3), dtype=np.uint8)
+    if faces and face_image is None:
+        raise ValueError("--face-image is required for synthetic frames with faces")
+    if faces:
+        cell_width = width // faces
+        size = int(min(cell_width, height) * 0.6)
+        face = cv2.resize(face_image, (size, size), interpolation=cv2.INTER_AREA)
+    frames = []
+    for index in range(count):
+        frame = background.copy()
+        shift = int(4 * np.sin(index / 5))
+        for slot in range(faces):
+            x = slot * cell_width + (cell_width - size) // 2 + shift
+            y = (height - size) // 2
+            frame[y:y + size, x:x + size] = face
+        frames.append(frame)
+    return frames
+
+
+def clip_frames(path, count):
+    """
+    Reads up to `count` frames of a recorded clip.
+    """
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def percentiles(samples):
+    """
+    Returns the p50, p95 and p99 of a list of seconds, in milliseconds.
+    """
+    if not samples:
+        return None
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "runs": len(samples),
+    }
+
+
+async def run_workload(processor, image_encoding, frames, fps, warmup):
+    """
+    Feeds the frames to the processor with timestamps spaced as in a `fps` video and collects the timings of every
+    frame after the first `warmup` ones.
+    """
+    timings = defaultdict(list)
+    for index, frame in enumerate(frames[:warmup]):
+        await processor.analyze_frame(image_encoding, frame, index / fps)
+
+    measured = frames[warmup:]
+    start = time.perf_counter()
+    for index, frame in enumerate(measured, start=warmup):
+        await processor.analyze_frame(image_encoding, frame, index / fps)
+        for name, elapsed in processor.last_timings.items():
+            timings[name].append(elapsed)
+    seconds = time.perf_counter() - start
+    return {
+        "frames": len(measured),
+        "fps": len(measured) / seconds if seconds > 0 else 0.0,
+        "stages": {name: percentiles(timings[name]) for name in ("context",) + ANALYZERS + ("frame",)},
+        "motion_gate": processor.motion_gate.stats() if processor.motion_gate is not None else None,
+    }
+
+
+def print_workload(label, result):
+    print(f"\n{label}: {result['frames']} frames, {result['fps']:.1f} fps")
+    if result["motion_gate"]:
+        print(f"  skipped by the motion gate: {result['motion_gate']['skipped']}")
+    for name, stats in result["stages"].items():
+        if stats is None:
+            print(f"  {name:<12} not run")
+            continue
+        print(f"  {name:<12} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"p99 {stats['p99_ms']:8.2f} ms  ({stats['runs']} runs)")
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Prints the workloads whose end-to-end p95 or fps regressed by more than `tolerance` against a previous run.
+    """
+    with open(baseline_path) as file:
+        baseline = {workload["label"]: workload for workload in json.load(file)["workloads"]}
+    regressions = 0
+    for workload in results:
+        previous = baseline.get(workload["label"])
+        if previous is None:
+            continue
+        p95, previous_p95 = workload["stages"]["frame"]["p95_ms"], previous["stages"]["frame"]["p95_ms"]
+        if p95 > previous_p95 * (1 + tolerance) or workload["fps"] < previous["fps"] * (1 - tolerance):
+            regressions += 1
+            print(f"REGRESSION {workload['label']}: p95 {previous_p95:.2f} -> {p95:.2f} ms, "
+                  f"fps {previous['fps']:.1f} -> {workload['fps']:.1f}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resolutions", nargs="*", default=["640x480", "1280x720"],
+                        help="synthetic frame sizes as WIDTHxHEIGHT")
+    parser.add_argument("--faces", type=int, nargs="*", default=[0, 1],
+                        help="face counts of the synthetic frames; above 0 needs --face-image (default: 0 1)")
+    parser.add_argument("--face-image", help="face picture pasted into the synthetic frames, also the known face")
+    parser.add_argument("--clips", nargs="*", default=[], help="short recorded clips to run as well")
+    parser.add_argument("--frames", type=int, default=100, help="measured frames per workload (default: 100)")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured frames per workload (default: 5)")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate the timestamps simulate (default: 30)")
+    parser.add_argument("--every-frame", action="store_true",
+                        help="run every analyzer on every frame instead of the default schedule")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="resize factor of the frame for face detection (default: 1, the full frame)")
+    parser.add_argument("--detection-roi", action="store_true",
+                        help="search for faces only around the last known faces")
+    parser.add_argument("--proctoring", action="store_true",
+                        help="detect only the proctoring objects, batched, instead of every COCO class")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="reuse the previous results for frames that barely changed")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative slowdown against the baseline (default: 0.1)")
+    args = parser.parse_args()
+
+    face_image = cv2.imread(args.face_image) if args.face_image else None
+    # Not cached: the benchmark faces must not end up in the encoding cache of the interviews
+    image_encoding = await known_image_encoding(args.face_image, use_cache=False) if args.face_image else None
+
+    workloads = []
+    for resolution in args.resolutions:
+        width, height = (int(value) for value in resolution.lower().split("x"))
+        for faces in args.faces:
+            if faces and face_image is None:
+                print(f"synthetic {width}x{height} {faces} faces: no --face-image, skipped")
+                continue
+            frames = synthetic_frames(width, height, faces, face_image, args.frames + args.warmup)
+            workloads.append((f"synthetic {width}x{height} {faces} faces", frames))
+    for clip in args.clips:
+        workloads.append((f"clip {clip}", clip_frames(clip, args.frames + args.warmup)))
+
+    results = []
+    for label, frames in workloads:
+        if len(frames) <= args.warmup:
+            print(f"\n{label}: not enough frames, skipped")
+            continue
+        schedule = AnalyzerSchedule({name: None for name in ANALYZERS} if args.every_frame else None)
+        if image_encoding is None:
+            # Without a known face there is nothing to verify attendance against
+            schedule.set_rate("attendance", 0)
+        processor = VideoProcessor(schedule=schedule, detection_scale=args.detection_scale,
+                                   detection_roi=args.detection_roi, proctoring=args.proctoring,
+                                   motion_gate=args.motion_gate)
+        try:
+            result = await run_workload(processor, image_encoding, frames, args.fps, args.warmup)
+        finally:
+            processor.close()
+        result["label"] = label
+        results.append(result)
+        print_workload(label, result)
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\npeak RSS {peak_rss_mb:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"peak_rss_mb": peak_rss_mb, "every_frame": args.every_frame,
+                       "detection_scale": args.detection_scale, "detection_roi": args.detection_roi,
+                       "workloads": results}, file, indent=2)
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+The `predict` options `detect_objects` passes to the YOLO model, checked with a fake model. Run from the application
+root (the directory containing `modules/` and `loggers/`).
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from modules.voice_bot.video_process.detect_object import PROCTORING_CLASSES, PROCTORING_IMGSZ, detect_objects
+
+
+class FakeBoxes:
+    def __init__(self, classes):
+        self.cls = list(classes)
+        self.xyxy = FakeTensor([[0, 0, 10, 10]] * len(classes))
+
+
+class FakeTensor(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    names = {0: "person", 67: "cell phone"}
+
+    def __init__(self, classes=()):
+        self.calls = []
+        self.classes = classes
+
+    def predict(self, frame, **kwargs):
+        self.calls.append(kwargs)
+        result = type("Result", (), {"names": self.names, "boxes": FakeBoxes(self.classes)})()
+        return [result]
+
+
+def test_headless_predict_keeps_model_defaults():
+    model = FakeModel(classes=[0, 67, 0])
+
+    frame, log_message, obj_counts = asyncio.run(detect_objects("frame", model, headless=True))
+
+    assert model.calls == [{"verbose": False}]
+    assert frame == "frame"
+    assert obj_counts == {"person": 2, "cell phone": 1}
+
+
+def test_proctoring_predict_passes_classes_and_size():
+    model = FakeModel()
+
+    asyncio.run(detect_objects("frame", model, classes=PROCTORING_CLASSES, imgsz=PROCTORING_IMGSZ, headless=True))
+
+    assert model.calls == [{"verbose": False, "classes": list(PROCTORING_CLASSES), "imgsz": PROCTORING_IMGSZ}]
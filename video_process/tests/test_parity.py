@@ -0,0 +1,58 @@
+"""
+Parity of the exported models with the original ones on the fixture frames of tools/fixtures/frames. Run from the
+application root (the directory containing `modules/` and `loggers/`) after tools/export_models.py:
+
+    python -m pytest video_process/tests/test_parity.py
+
+Skipped when ONNX Runtime or the original or exported models are not available.
+"""
+
+import asyncio
+import glob
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("cv2")
+
+from modules.voice_bot.video_process.inference_backend import onnx_path
+from modules.voice_bot.video_process.model_registry import MODEL_PATHS, ModelRegistry
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tools"))
+from check_parity import compare
+
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "tools", "fixtures", "frames", "*.png")))
+
+
+def _models_available(backend):
+    paths = [MODEL_PATHS["emotion"], MODEL_PATHS["yolo"]]
+    paths += [onnx_path(path, backend) for path in paths]
+    return all(os.path.exists(path) for path in paths)
+
+
+# The fixtures with a phone-like object; the reference YOLO model must find an object there, otherwise the object
+# agreement only compares empty detections
+OBJECT_FIXTURES = ("frame_05.png", "frame_06.png")
+
+# The thresholds of tools/check_parity.py
+MIN_EMOTION_AGREEMENT = 0.95
+MIN_OBJECT_AGREEMENT = 0.9
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_exported_models_agree(backend):
+    if not _models_available(backend):
+        pytest.skip(f"original or {backend} models not found, run tools/export_models.py")
+    assert FIXTURES
+
+    report = asyncio.run(compare(FIXTURES, ModelRegistry("keras"), ModelRegistry(backend), whole_frame=True))
+
+    assert report["frames"] == len(FIXTURES)
+    assert report["faces"] >= len(FIXTURES)
+    for name in OBJECT_FIXTURES:
+        assert report["reference_objects"][name], f"the reference model detects nothing on {name}"
+    assert report["emotion_agreement"] >= MIN_EMOTION_AGREEMENT, report["mismatches"]
+    assert report["object_agreement"] >= MIN_OBJECT_AGREEMENT, report["mismatches"]
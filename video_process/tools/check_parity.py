@@ -0,0 +1,109 @@
+"""
+Checks that the exported models give the same labels as the original models on fixture frames.
+
+For every image of `--fixtures`, the faces found by the Haar cascade are classified by the Keras emotion model and by
+the emotion model of `--backend`, and the proctoring objects are counted by the PyTorch YOLO model and by the YOLO
+model of `--backend`. The script prints the share of faces with the same emotion label and of frames with the same
+object counts, and exits non-zero if either is below its threshold. Run it from the application root after
+tools/export_models.py:
+
+    python video_process/tools/check_parity.py --fixtures video_process/tools/fixtures/frames --backend onnx-int8
+
+The same check runs under pytest on the committed fixture frames (video_process/tests/test_parity.py).
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+
+import cv2
+
+from modules.voice_bot.video_process.detect_object import PROCTORING_CLASSES, PROCTORING_IMGSZ, detect_objects
+from modules.voice_bot.video_process.emotion import extract_emotion_rois, predict_emotion_labels
+from modules.voice_bot.video_process.inference_backend import BACKENDS
+from modules.voice_bot.video_process.model_registry import ModelRegistry
+
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+async def compare(fixtures, reference, candidate, whole_frame=False):
+    """
+    Runs the fixture frames through the models of two registries and counts the matching labels. With `whole_frame`,
+    a frame in which the cascade finds no face is classified whole, so every frame checks the emotion model.
+    """
+    face_classifier = reference.acquire("face_classifier")
+    reference_emotion, candidate_emotion = reference.get("emotion"), candidate.get("emotion")
+    reference_yolo, candidate_yolo = reference.acquire("yolo"), candidate.acquire("yolo")
+    faces = emotion_matches = 0
+    frames = object_matches = 0
+    mismatches = []
+    reference_objects = {}
+    try:
+        for path in fixtures:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            boxes = face_classifier.detectMultiScale(gray)
+            if whole_frame and len(boxes) == 0:
+                boxes = [(0, 0, gray.shape[1], gray.shape[0])]
+            rois = extract_emotion_rois(gray, boxes)
+            expected = predict_emotion_labels(reference_emotion, rois)
+            found = predict_emotion_labels(candidate_emotion, rois)
+            faces += len(expected)
+            emotion_matches += sum(a == b for a, b in zip(expected, found))
+            if expected != found:
+                mismatches.append(f"{os.path.basename(path)}: emotion {expected} != {found}")
+
+            _, _, expected_counts = await detect_objects(frame, reference_yolo, classes=PROCTORING_CLASSES,
+                                                         imgsz=PROCTORING_IMGSZ, headless=True)
+            _, _, found_counts = await detect_objects(frame, candidate_yolo, classes=PROCTORING_CLASSES,
+                                                      imgsz=PROCTORING_IMGSZ, headless=True)
+            reference_objects[os.path.basename(path)] = expected_counts
+            frames += 1
+            object_matches += expected_counts == found_counts
+            if expected_counts != found_counts:
+                mismatches.append(f"{os.path.basename(path)}: objects {expected_counts} != {found_counts}")
+    finally:
+        reference.release("face_classifier", face_classifier)
+        reference.release("yolo", reference_yolo)
+        candidate.release("yolo", candidate_yolo)
+    return {
+        "faces": faces,
+        "emotion_agreement": emotion_matches / faces if faces else 1.0,
+        "frames": frames,
+        "object_agreement": object_matches / frames if frames else 1.0,
+        "mismatches": mismatches,
+        "reference_objects": reference_objects,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", required=True, help="directory of fixture frames")
+    parser.add_argument("--backend", default="onnx", choices=[name for name in BACKENDS if name != "keras"],
+                        help="backend compared with the original models (default: onnx)")
+    parser.add_argument("--min-emotion-agreement", type=float, default=0.95,
+                        help="minimum share of faces with the same emotion (default: 0.95)")
+    parser.add_argument("--min-object-agreement", type=float, default=0.9,
+                        help="minimum share of frames with the same object counts (default: 0.9)")
+    args = parser.parse_args()
+
+    fixtures = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(args.fixtures, pattern)))
+    if not fixtures:
+        parser.error(f"no images found in {args.fixtures}")
+
+    report = asyncio.run(compare(fixtures, ModelRegistry("keras"), ModelRegistry(args.backend)))
+    for mismatch in report["mismatches"]:
+        print(mismatch)
+    print(f"emotion: {report['emotion_agreement']:.1%} of {report['faces']} faces agree")
+    print(f"objects: {report['object_agreement']:.1%} of {report['frames']} frames agree")
+    if (report["emotion_agreement"] < args.min_emotion_agreement
+            or report["object_agreement"] < args.min_object_agreement):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Exports the learned models of the video pipeline to ONNX, optionally quantized to INT8.
+
+The emotion classifier (`Emotion_Detection.h5`) is converted with tf2onnx and YOLOv8n (`yolov8n.pt`) with the
+ultralytics exporter, both with a dynamic batch axis so the batchers can run several faces or frames per call. With
+`--int8`, a statically quantized copy (`*.int8.onnx`) is written as well, calibrated on the images of
+`--calibration-dir` (interview frames). Run it from the application root once per model update:
+
+    python video_process/tools/export_models.py --int8 --calibration-dir fixtures/frames
+
+Then select the runtime with VIDEO_INFERENCE_BACKEND=onnx or VIDEO_INFERENCE_BACKEND=onnx-int8 and check the labels
+with tools/check_parity.py.
+"""
+
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from modules.voice_bot.video_process.detect_object import PROCTORING_IMGSZ
+from modules.voice_bot.video_process.emotion import EMOTION_INPUT_SIZE, extract_emotion_rois
+from modules.voice_bot.video_process.inference_backend import onnx_path
+from modules.voice_bot.video_process.model_registry import MODEL_PATHS
+
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def calibration_images(directory, limit):
+    """
+    Returns up to `limit` BGR images of a directory.
+    """
+    paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+    images = [cv2.imread(path) for path in paths[:limit]]
+    return [image for image in images if image is not None]
+
+
+def emotion_calibration_inputs(images):
+    """
+    Builds emotion classifier inputs from calibration frames: the Haar cascade faces, as the analyzer crops them, or
+    the whole frame when no face is found.
+    """
+    face_classifier = cv2.CascadeClassifier(MODEL_PATHS["face_classifier"])
+    inputs = []
+    for image in images:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = face_classifier.detectMultiScale(gray)
+        if len(faces) == 0:
+            faces = [(0, 0, gray.shape[1], gray.shape[0])]
+        inputs.extend(extract_emotion_rois(gray, faces))
+    return inputs
+
+
+def yolo_calibration_inputs(images, imgsz):
+    """
+    Builds YOLO inputs from calibration frames: letterboxed to `imgsz`, RGB, NCHW, scaled to [0, 1].
+    """
+    inputs = []
+    for image in images:
+        height, width = image.shape[:2]
+        scale = imgsz / max(height, width)
+        resized = cv2.resize(image, (int(round(width * scale)), int(round(height * scale))))
+        canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+        top = (imgsz - resized.shape[0]) // 2
+        left = (imgsz - resized.shape[1]) // 2
+        canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+        rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
+        inputs.append(rgb.transpose(2, 0, 1).astype(np.float32) / 255.0)
+    return inputs
+
+
+def quantize(model_path, output_path, inputs):
+    """
+    Writes a statically quantized (INT8 weights and activations) copy of an ONNX model, calibrated on `inputs`.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._inputs = iter(inputs)
+
+        def get_next(self):
+            item = next(self._inputs, None)
+            return None if item is None else {input_name: item[np.newaxis].astype(np.float32)}
+
+    quantize_static(model_path, output_path, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    print(f"Wrote {output_path}")
+
+
+def export_emotion(opset):
+    """
+    Converts the Keras emotion classifier to ONNX with a dynamic batch axis.
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from keras.models import load_model
+
+    output_path = onnx_path(MODEL_PATHS["emotion"], "onnx")
+    model = load_model(MODEL_PATHS["emotion"])
+    signature = (tf.TensorSpec((None,) + EMOTION_INPUT_SIZE + (3,), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=output_path)
+    print(f"Wrote {output_path}")
+    return output_path
+
+
+def export_yolo(imgsz, opset):
+    """
+    Exports YOLOv8n to ONNX with dynamic batch and image axes.
+    """
+    from ultralytics import YOLO
+
+    exported = YOLO(MODEL_PATHS["yolo"]).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True,
+                                                opset=opset)
+    output_path = onnx_path(MODEL_PATHS["yolo"], "onnx")
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        os.replace(exported, output_path)
+    print(f"Wrote {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", nargs="*", default=["emotion", "yolo"], choices=["emotion", "yolo"],
+                        help="models to export (default: both)")
+    parser.add_argument("--imgsz", type=int, default=PROCTORING_IMGSZ,
+                        help=f"YOLO input size (default: {PROCTORING_IMGSZ})")
+    parser.add_argument("--opset", type=int, default=13, help="ONNX opset (default: 13)")
+    parser.add_argument("--int8", action="store_true", help="also write statically quantized INT8 models")
+    parser.add_argument("--calibration-dir", help="interview frames used to calibrate the INT8 models")
+    parser.add_argument("--calibration-limit", type=int, default=200,
+                        help="maximum calibration images (default: 200)")
+    args = parser.parse_args()
+
+    if args.int8 and not args.calibration_dir:
+        parser.error("--int8 needs --calibration-dir")
+    images = calibration_images(args.calibration_dir, args.calibration_limit) if args.int8 else []
+    if args.int8 and not images:
+        parser.error(f"no images found in {args.calibration_dir}")
+
+    if "emotion" in args.models:
+        path = export_emotion(args.opset)
+        if args.int8:
+            quantize(path, onnx_path(MODEL_PATHS["emotion"], "onnx-int8"), emotion_calibration_inputs(images))
+    if "yolo" in args.models:
+        path = export_yolo(args.imgsz, args.opset)
+        if args.int8:
+            quantize(path, onnx_path(MODEL_PATHS["yolo"], "onnx-int8"), yolo_calibration_inputs(images, args.imgsz))
+
+
+if __name__ == "__main__":
+    main()
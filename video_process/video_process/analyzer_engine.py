@@ -0,0 +1,170 @@
+
+
+import asyncio
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from modules.voice_bot.video_process.thread_budget import get_thread_budget
+
+
+class AnalyzerCall:
+    """
+    A single analyzer invocation to be dispatched by the `AnalyzerEngine`.
+
+    The analyzers in this package are `async` functions that never await anything, so awaiting them on the event
+    loop runs them serially and blocks every other request. An `AnalyzerCall` instead runs the analyzer to completion
+    inside a worker pool.
+    """
+
+    def __init__(self, func, *args, mode="thread", **kwargs):
+        """
+        Args:
+            - func (callable): The analyzer function (sync or async) to call.
+            - *args: Positional arguments passed to the analyzer.
+            - mode (str, optional): "thread" for work that releases the GIL (OpenCV, dlib, Keras/TensorFlow,
+              PyTorch, MediaPipe) or "process" for pure-Python work that holds it. Process calls must use a
+              module-level function and picklable arguments. Defaults to "thread".
+            - **kwargs: Keyword arguments passed to the analyzer.
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(
+                f"Invalid analyzer mode {mode!r}. Expected 'thread' or 'process'")
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.mode = mode
+
+
+def run_coroutine_sync(coro):
+    """
+    Drives a coroutine that never suspends to completion without an event loop.
+
+    Args:
+        - coro (coroutine): The coroutine returned by calling an analyzer.
+
+    Returns:
+        The value returned by the coroutine.
+
+    Raises:
+        RuntimeError: If the coroutine awaits something that actually suspends.
+    """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError(
+        f"Analyzer coroutine {coro.__qualname__} suspended; it cannot run inside a worker pool")
+
+
+def _run_analyzer(func, args, kwargs):
+    """
+    Runs one analyzer inside a worker and measures how long it took.
+
+    Returns:
+        tuple: The analyzer result and its wall time in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    if inspect.iscoroutine(result):
+        result = run_coroutine_sync(result)
+    return result, time.perf_counter() - start
+
+
+class AnalyzerEngine:
+    """
+    The `AnalyzerEngine` class dispatches the per-frame analyzers to worker pools so that they run in parallel
+    and off the event loop. Threads are used for analyzers whose heavy work releases the GIL, and a process pool is
+    created on demand for analyzers marked as "process".
+    """
+
+    def __init__(self, max_workers=None, process_workers=None, process_initializer=None, process_initargs=()):
+        """
+        Args:
+            - max_workers (int, optional): The number of analyzer threads. Defaults to one per analyzer (8).
+            - process_workers (int, optional): The size of the process pool. Defaults to the number of CPUs.
+            - process_initializer (callable, optional): Called once in every worker process, e.g. to load models.
+            - process_initargs (tuple, optional): Arguments passed to `process_initializer`.
+        """
+        self.thread_pool = ThreadPoolExecutor(
+            max_workers=max_workers or 8, thread_name_prefix="video-analyzer")
+        self.process_workers = process_workers or os.cpu_count()
+        self.process_initializer = process_initializer
+        self.process_initargs = process_initargs
+        self._process_pool = None
+
+    @property
+    def process_pool(self):
+        """ProcessPoolExecutor: The process pool, created on first use."""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                initializer=self.process_initializer,
+                initargs=self.process_initargs)
+        return self._process_pool
+
+    async def run_in_thread(self, func, *args):
+        """
+        Runs a blocking function in the analyzer thread pool without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, func, *args)
+
+    async def run(self, calls):
+        """
+        Runs every analyzer call concurrently and waits for all of them.
+
+        Args:
+            - calls (dict): A mapping of analyzer name to `AnalyzerCall`.
+
+        Returns:
+            tuple: A tuple containing the results and the timings.
+                - results (dict): The result of each analyzer, by name.
+                - timings (dict): The wall time in seconds of each analyzer, by name, plus the key "frame" with
+                  the wall time of the whole dispatch.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        names = list(calls)
+        futures = []
+        for name in names:
+            call = calls[name]
+            pool = self.process_pool if call.mode == "process" else self.thread_pool
+            futures.append(loop.run_in_executor(
+                pool, _run_analyzer, call.func, call.args, call.kwargs))
+        outcomes = await asyncio.gather(*futures)
+
+        results = {}
+        timings = {}
+        for name, (result, elapsed) in zip(names, outcomes):
+            results[name] = result
+            timings[name] = elapsed
+        timings["frame"] = time.perf_counter() - start
+        return results, timings
+
+    def shutdown(self, wait=True):
+        """
+        Shuts down the worker pools.
+        """
+        self.thread_pool.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+            self._process_pool = None
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    """
+    Returns the engine shared by every `VideoProcessor` in this process, creating it on first use, sized by the
+    thread budget of the process.
+    """
+    global _default_engine
+    if _default_engine is None:
+        budget = get_thread_budget()
+        _default_engine = AnalyzerEngine(max_workers=budget.analyzer_workers,
+                                         process_workers=len(budget.session_cores(0)))
+    return _default_engine
@@ -0,0 +1,69 @@
+
+
+class AnalyzerSchedule:
+    """
+    The `AnalyzerSchedule` class decides on which frames each analyzer runs. Every analyzer declares a target rate
+    in Hz; an analyzer without a rate runs on every frame. When an analyzer is skipped, its last result is carried
+    forward so the combined event log stays complete.
+    """
+
+    # Identity, object and emotion checks do not need the full camera frame rate
+    DEFAULT_RATES = {
+        "attendance": 1.0,
+        "objects": 2.0,
+        "emotion": 5.0,
+    }
+
+    def __init__(self, rates=None):
+        """
+        Args:
+            - rates (dict, optional): A mapping of analyzer name to target rate in Hz. `None` runs the analyzer
+              on every frame and `0` disables it. Defaults to `DEFAULT_RATES`.
+        """
+        self.rates = dict(self.DEFAULT_RATES if rates is None else rates)
+        self._last_run = {}
+        self._last_result = {}
+
+    def set_rate(self, name, rate):
+        """
+        Changes the target rate of an analyzer.
+
+        Args:
+            - name (str): The analyzer name.
+            - rate (float): The new rate in Hz, `None` for every frame or `0` to disable the analyzer.
+        """
+        self.rates[name] = rate
+
+    def due(self, name, timestamp):
+        """
+        Checks whether an analyzer should run on the frame captured at `timestamp`.
+
+        Args:
+            - name (str): The analyzer name.
+            - timestamp (float): The frame timestamp in seconds.
+
+        Returns:
+            bool: True if the analyzer should run on this frame.
+        """
+        rate = self.rates.get(name)
+        if rate is None:
+            return True
+        if rate <= 0:
+            return False
+        last_run = self._last_run.get(name)
+        if last_run is None or timestamp < last_run:
+            return True
+        return timestamp - last_run >= 1.0 / rate
+
+    def record(self, name, timestamp, result):
+        """
+        Stores the result of an analyzer that ran on the frame captured at `timestamp`.
+        """
+        self._last_run[name] = timestamp
+        self._last_result[name] = result
+
+    def last_result(self, name, default=None):
+        """
+        Returns the most recent result of an analyzer, or `default` if it has never run.
+        """
+        return self._last_result.get(name, default)
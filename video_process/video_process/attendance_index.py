@@ -0,0 +1,169 @@
+
+
+import threading
+
+import numpy as np
+from modules.voice_bot.video_process.frame_context import FrameContext
+
+
+# The distance under which face_recognition.compare_faces considers two encodings the same person
+DEFAULT_TOLERANCE = 0.6
+
+ENCODING_SIZE = 128
+
+
+class AttendanceIndex:
+    """
+    The `AttendanceIndex` class holds the known face encodings of many candidates (a proctoring room or a panel
+    interview) in one contiguous NumPy matrix, and matches every face of a frame against all of them with a single
+    matrix product instead of one `compare_faces` call per face and candidate.
+
+    Candidates are added and removed in place: the matrix grows by doubling, and a removed row is filled with the
+    last row, so neither operation rebuilds the index. It is safe to share between sessions.
+    """
+
+    def __init__(self, capacity=16, tolerance=DEFAULT_TOLERANCE):
+        """
+        Args:
+            - capacity (int, optional): The number of candidates allocated up front. Defaults to 16.
+            - tolerance (float, optional): The maximum distance of a match. Defaults to 0.6, as face_recognition.
+        """
+        self.tolerance = tolerance
+        self._encodings = np.empty((max(capacity, 1), ENCODING_SIZE), dtype=np.float64)
+        self._norms = np.empty(max(capacity, 1), dtype=np.float64)
+        self._ids = []
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, candidate_id):
+        return candidate_id in self._rows
+
+    @property
+    def ids(self):
+        """list: The candidate ids, in row order."""
+        return list(self._ids)
+
+    def add(self, candidate_id, encoding):
+        """
+        Adds a candidate, or replaces the encoding of a known one.
+
+        Args:
+            - candidate_id: Any hashable id of the candidate.
+            - encoding (numpy.ndarray): The 128-dimension face encoding, e.g. from `known_image_encoding`.
+        """
+        encoding = np.asarray(encoding, dtype=np.float64).reshape(ENCODING_SIZE)
+        with self._lock:
+            row = self._rows.get(candidate_id)
+            if row is None:
+                row = len(self._ids)
+                if row == len(self._encodings):
+                    self._encodings = np.concatenate([self._encodings, np.empty_like(self._encodings)])
+                    self._norms = np.concatenate([self._norms, np.empty_like(self._norms)])
+                self._ids.append(candidate_id)
+                self._rows[candidate_id] = row
+            self._encodings[row] = encoding
+            self._norms[row] = encoding @ encoding
+
+    def remove(self, candidate_id):
+        """
+        Removes a candidate. The last row takes its place, so the matrix stays contiguous.
+
+        Raises:
+            KeyError: If the candidate is not in the index.
+        """
+        with self._lock:
+            row = self._rows.pop(candidate_id)
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._encodings[row] = self._encodings[last]
+                self._norms[row] = self._norms[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+
+    def distances(self, face_encodings):
+        """
+        Computes the distance of every face to every candidate.
+
+        Args:
+            - face_encodings (numpy.ndarray): An (N_faces, 128) array of face encodings.
+
+        Returns:
+            tuple: The candidate ids in column order and an (N_faces, N_candidates) array of Euclidean distances.
+        """
+        faces = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        with self._lock:
+            count = len(self._ids)
+            ids = list(self._ids)
+            known = self._encodings[:count].copy()
+            known_norms = self._norms[:count].copy()
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, so all pairs take one matrix product
+        squared = (faces * faces).sum(axis=1)[:, np.newaxis] + known_norms[np.newaxis, :] - 2.0 * faces @ known.T
+        return ids, np.sqrt(np.maximum(squared, 0.0))
+
+    def match(self, face_encodings, tolerance=None):
+        """
+        Identifies every face as its nearest candidate.
+
+        Args:
+            - face_encodings (numpy.ndarray): An (N_faces, 128) array of face encodings.
+            - tolerance (float, optional): The maximum distance of a match. Defaults to the index tolerance.
+
+        Returns:
+            list: One (candidate_id, distance) tuple per face. candidate_id is None when no candidate is within the
+            tolerance; distance is that of the nearest candidate (None for an empty index).
+        """
+        tolerance = self.tolerance if tolerance is None else tolerance
+        ids, distances = self.distances(face_encodings)
+        if not ids:
+            return [(None, None)] * len(distances)
+        nearest = distances.argmin(axis=1)
+        matches = []
+        for face, column in enumerate(nearest):
+            distance = float(distances[face, column])
+            matches.append((ids[column] if distance <= tolerance else None, distance))
+        return matches
+
+
+async def identify_faces(index, frame, context=None, overlay=None):
+    """
+    Identifies every face of a frame against the candidates of an attendance index.
+
+    Args:
+        - index (AttendanceIndex): The known candidates.
+        - frame (numpy.ndarray): The video frame in BGR format.
+        - context (FrameContext, optional): The shared per-frame context whose RGB frame and face rectangles are
+          reused. Built from the frame when not given, with face_recognition's own detector.
+        - overlay (Overlay, optional): Records the box and id of every face when rendering is on.
+
+    Returns:
+        list: One (candidate_id, distance, (top, right, bottom, left)) tuple per face; candidate_id is None for a
+        face that matches no candidate.
+    """
+    import face_recognition
+
+    if context is not None:
+        rgb_frame = context.rgb
+        face_locations = context.face_locations
+    else:
+        rgb_frame = FrameContext(frame, None, None).rgb
+        face_locations = face_recognition.face_locations(rgb_frame)
+    if not face_locations:
+        return []
+
+    # Every face is encoded in one call and matched against every candidate in one matrix product
+    encodings = np.array(face_recognition.face_encodings(rgb_frame, face_locations))
+    identities = [(candidate_id, distance, location)
+                  for (candidate_id, distance), location in zip(index.match(encodings), face_locations)]
+
+    if overlay is not None:
+        for candidate_id, _, (top, right, bottom, left) in identities:
+            color = (0, 255, 0) if candidate_id is not None else (0, 0, 255)
+            overlay.rectangle((left, top), (right, bottom), color, 2)
+            overlay.text(str(candidate_id if candidate_id is not None else "Unknown"), (left, bottom + 20), 0.9,
+                         color, 2)
+    return identities
@@ -0,0 +1,109 @@
+
+
+import functools
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    The `MicroBatcher` class groups model inputs submitted concurrently by many callers (faces of a frame, frames of
+    a session, or several sessions) into a single forward pass. Inputs are stacked along the first axis, the batch
+    function runs once on a dedicated thread, and each caller receives the slice of the outputs that belongs to it.
+    """
+
+    def __init__(self, run_batch, max_batch=32, max_delay=0.0, name="micro-batcher"):
+        """
+        Args:
+            - run_batch (callable): Takes a stacked numpy array of inputs and returns a sequence with one output
+              per input row.
+            - max_batch (int, optional): The maximum number of input rows per forward pass. Defaults to 32.
+            - max_delay (float, optional): How long in seconds to wait for more inputs once the first one arrived.
+              With 0, only the inputs already queued are batched, so a lone caller never waits. Defaults to 0.
+            - name (str, optional): The name of the worker thread.
+        """
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._serve, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, inputs, max_delay=None):
+        """
+        Queues a stack of inputs for the next forward pass.
+
+        Args:
+            - inputs (numpy.ndarray): The inputs, stacked along the first axis.
+            - max_delay (float, optional): How long to wait for more inputs when these open a batch. Defaults to
+              the batcher's `max_delay`.
+
+        Returns:
+            concurrent.futures.Future: Resolves to a list with one output per input row.
+        """
+        future = Future()
+        if len(inputs) == 0:
+            future.set_result([])
+        else:
+            self._requests.put((inputs, future, max_delay))
+        return future
+
+    def __call__(self, inputs, max_delay=None):
+        """
+        Submits the inputs and blocks until their outputs are ready.
+        """
+        return self.submit(inputs, max_delay).result()
+
+    def with_delay(self, max_delay):
+        """
+        Returns a callable that submits to this batcher with its own `max_delay`, so one group of callers can wait
+        for each other without changing the latency of the others.
+        """
+        return functools.partial(self, max_delay=max_delay)
+
+    def combine(self, inputs):
+        """
+        Joins the inputs of the queued requests into one batch. Subclasses whose inputs cannot be stacked (e.g.
+        frames of different sizes) override it.
+        """
+        return np.concatenate(inputs)
+
+    def _collect(self):
+        """
+        Blocks for the first request, then gathers more until the batch is full or the delay of the first request
+        (by default `max_delay`) expires.
+        """
+        batch = [self._requests.get()]
+        size = len(batch[0][0])
+        max_delay = self.max_delay if batch[0][2] is None else batch[0][2]
+        while size < self.max_batch:
+            try:
+                if max_delay > 0:
+                    request = self._requests.get(timeout=max_delay)
+                else:
+                    request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _serve(self):
+        while True:
+            batch = self._collect()
+            try:
+                outputs = self.run_batch(self.combine(
+                    [inputs for inputs, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for inputs, future, _ in batch:
+                future.set_result(list(outputs[start:start + len(inputs)]))
+                start += len(inputs)
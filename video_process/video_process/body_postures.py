@@ -1,10 +1,10 @@
 
 
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
 from loggers.timer_decorator import timer_decorator
+from modules.voice_bot.video_process.geometry import joint_angles, shoulder_angles
 
 
 import numpy as np
@@ -23,13 +23,10 @@ async def calculate_angle(landmark1, landmark2, landmark3):
     Returns:
         float: The angle between the three points in degrees.
     """
-    a = np.array(landmark1) - np.array(landmark2)
-    b = np.array(landmark3) - np.array(landmark2)
-    angle = np.arccos(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-    return np.degrees(angle)
+    return float(joint_angles(landmark1, landmark2, landmark3))
 
 
-async def body_posture(frame, pose, mp_drawing, mp_pose, previous_angles):
+async def body_posture(frame, pose, mp_drawing, mp_pose, previous_angles, context=None, overlay=None):
     """
     Perform pose estimation on the given frame and calculate the angles of the shoulders.
 
@@ -39,24 +36,29 @@ async def body_posture(frame, pose, mp_drawing, mp_pose, previous_angles):
         - mp_drawing: The drawing utility object from the Mediapipe library.
         - mp_pose: The pose module object from the Mediapipe library.
         - previous_angles (list): A list of previous shoulder angles.
+        - context (FrameContext, optional): The shared per-frame context whose RGB conversion is reused.
+        - overlay (Overlay, optional): Records the pose skeleton and warnings when rendering is on. The frame itself
+          is never drawn on.
 
     Returns:
-        tuple: A tuple containing the annotated frame, movement message, and current angles.
-            - annotated_frame (numpy.ndarray): The input frame with pose annotations.
+        tuple: A tuple containing the frame, movement message, and current angles.
+            - frame (numpy.ndarray): The input frame.
             - movement_message (str): A message indicating if movement is detected.
             - current_angles (list): The angles of the left and right shoulders.
     """
     # Convert the frame to RGB (as mediapipe requires RGB images)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if context is not None:
+        frame_rgb = context.rgb
+    else:
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
     # Perform pose estimation
     result = pose.process(frame_rgb)
     movement_message = ""
 
-    # Draw the pose annotations on the frame
     if result.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+        if overlay is not None:
+            overlay.add(mp_drawing.draw_landmarks, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
 
         landmarks = result.pose_landmarks.landmark
 
@@ -71,30 +73,21 @@ async def body_posture(frame, pose, mp_drawing, mp_pose, previous_angles):
         )
 
         if not shoulders_visible:
-            cv2.putText(frame, "Please set up your camera", (50, 50),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+            if overlay is not None:
+                overlay.text("Please set up your camera", (50, 50), 1, (0, 0, 255), 2)
             movement_message = "Please set up your camera"
             print(movement_message)
             return frame, movement_message, None
         else:
-            # Extract coordinates
-            left_elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].x,
-                          landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].y]
-            left_shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].x,
-                             landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y]
-            left_hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP].x,
-                        landmarks[mp_pose.PoseLandmark.LEFT_HIP].y]
-
-            right_elbow = [landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].x,
-                           landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].y]
-            right_shoulder = [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].x,
-                              landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y]
-            right_hip = [landmarks[mp_pose.PoseLandmark.RIGHT_HIP].x,
-                         landmarks[mp_pose.PoseLandmark.RIGHT_HIP].y]
-
-            # Calculate angles
-            left_shoulder_angle = await calculate_angle(left_elbow, left_shoulder, left_hip)
-            right_shoulder_angle = await calculate_angle(right_elbow, right_shoulder, right_hip)
+            # Extract the (elbow, shoulder, hip) coordinates of both sides
+            joints = [[mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_SHOULDER,
+                       mp_pose.PoseLandmark.LEFT_HIP],
+                      [mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_SHOULDER,
+                       mp_pose.PoseLandmark.RIGHT_HIP]]
+            points = [[(landmarks[i].x, landmarks[i].y) for i in side] for side in joints]
+
+            # Calculate both angles in one pass
+            left_shoulder_angle, right_shoulder_angle = shoulder_angles(points).tolist()
 
             current_angles = [left_shoulder_angle, right_shoulder_angle]
 
@@ -107,8 +100,8 @@ async def body_posture(frame, pose, mp_drawing, mp_pose, previous_angles):
                     print(movement_message)
             return frame, movement_message, current_angles
     else:
-        cv2.putText(frame, "Please set up your camera", (50, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+        if overlay is not None:
+            overlay.text("Please set up your camera", (50, 50), 1, (0, 0, 255), 2)
         return frame, "Please set up your camera", None
 
 # Sample usage
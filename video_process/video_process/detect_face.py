@@ -1,18 +1,24 @@
 
 
 import asyncio
+import io
 import os
+import time
 import cv2
-import face_recognition
 from loggers.timer_decorator import timer_decorator
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.encoding_cache import get_default_encoding_cache
 
 
-async def known_image_encoding(image_path):
+async def known_image_encoding(image_path, use_cache=True, cache=None):
     """
-    Returns the 128-dimension face encoding of the image.
+    Returns the 128-dimension face encoding of the image. Encodings are cached on disk by the hash of the image
+    content, so the same reference image is only decoded and encoded once.
 
     Args:
         - image_path (str or path-like object): The path to the image file.
+        - use_cache (bool, optional): Look the encoding up in, and store it into, the encoding cache. Defaults to True.
+        - cache (FaceEncodingCache, optional): The cache to use. Defaults to the process-wide cache.
 
     Returns:
         numpy.ndarray: A 128-dimensional numpy array representing the face encoding of the image.
@@ -22,11 +28,30 @@ async def known_image_encoding(image_path):
         raise ValueError(
             f"Invalid image_path type. Expected a string or path-like object, got {type(image_path)}")
 
+    # face_recognition loads dlib and its models on import, so it is only imported when an encoding is needed
+    import face_recognition
+
     try:
+        if not use_cache:
+            cache = None
+        elif cache is None:
+            cache = get_default_encoding_cache()
+        if cache is None:
+            img = face_recognition.load_image_file(image_path)
+            return face_recognition.face_encodings(img)[0]
+
+        with open(image_path, "rb") as file:
+            data = file.read()
+        key = cache.digest(data)
+        img_enc = cache.get(key)
+        if img_enc is not None:
+            return img_enc
+
         # Load image
-        img = face_recognition.load_image_file(image_path)
+        img = face_recognition.load_image_file(io.BytesIO(data))
         # Get 128-dimension face encoding
         img_enc = face_recognition.face_encodings(img)[0]
+        cache.put(key, img_enc)
         return img_enc
     except Exception as e:
         # Handle exceptions, such as file not found or face not detected
@@ -36,13 +61,71 @@ async def known_image_encoding(image_path):
 # print(asyncio.run(known_image_encoding(r"known_image\front_side.jpg")))
 
 
-async def mark_attendance(known_encoding, frame):
+REFERENCE_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def session_reference_image(session_id):
+    """
+    Returns the reference image of a session's candidate, stored on the server as `<session_id>.jpg` (or .jpeg,
+    .png) in `VIDEO_REFERENCE_IMAGE_DIR` (`modules/voice_bot/known_images` by default).
+
+    Args:
+        - session_id (int): The id of the interview session.
+
+    Returns:
+        str: The path of the image, or None if the session has no reference image.
+    """
+    directory = os.getenv("VIDEO_REFERENCE_IMAGE_DIR", r"modules/voice_bot/known_images")
+    for extension in REFERENCE_IMAGE_EXTENSIONS:
+        path = os.path.join(directory, f"{int(session_id)}{extension}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+ATTENDANCE_PRESENT = "Present"
+ATTENDANCE_OTHER_PERSON = "Absent - Another person is detected or Not looking at the center"
+ATTENDANCE_NO_FACE = "Absent - No face detected"
+
+
+def verify_identity(known_encoding, rgb_frame, face_locations):
+    """
+    Compares the first detected face against the known encoding, as `mark_attendance` does.
+
+    Args:
+        - known_encoding (numpy.ndarray): The known 128-dimension face encoding.
+        - rgb_frame (numpy.ndarray): The frame in RGB format.
+        - face_locations (list): The detected faces as (top, right, bottom, left) tuples.
+
+    Returns:
+        tuple: The attendance status and the (top, right, bottom, left) location of the verified face, or None
+        if no face is detected.
+    """
+    if len(face_locations) == 0:
+        return ATTENDANCE_NO_FACE, None
+
+    import face_recognition
+
+    # Only the first face decides the status, so only that face is encoded
+    location = face_locations[0]
+    face_encoding = face_recognition.face_encodings(rgb_frame, [location])[0]
+    matches = face_recognition.compare_faces([known_encoding], face_encoding)
+    if True in matches:
+        return ATTENDANCE_PRESENT, location
+    return ATTENDANCE_OTHER_PERSON, location
+
+
+async def mark_attendance(known_encoding, frame, context=None, overlay=None):
     """
     Marks the attendance of a person as "Present" or "Absent" based on face recognition.
 
     Args:
         - known_encoding (numpy.ndarray): A array representing the known face encoding used for comparison.
         - frame (numpy.ndarray): An image frame in BGR format.
+        - context (FrameContext, optional): The shared per-frame context. When given, its RGB frame and dlib face
+          rectangles are reused instead of running face_recognition's own face detection.
+        - overlay (Overlay, optional): Records the box of the verified face when rendering is on. The frame itself is
+          never drawn on.
 
     Returns:
         str: "Present" if the person is identified as present, "Absent - Another person is detected or Not looking at the center" if another person is detected or the person is not looking at the center, "Absent - No face detected" if no face is detected in the frame.
@@ -58,29 +141,137 @@ async def mark_attendance(known_encoding, frame):
         print(result)  # Output: 'Present' or 'Absent'
     """
     try:
-        person_absent = True
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(
-            rgb_frame, face_locations)
-
-        # If no faces are detected, mark as Absent
-        if len(face_locations) != 0:
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                matches = face_recognition.compare_faces(
-                    [known_encoding], face_encoding)
-                if True in matches:
-                    cv2.rectangle(frame, (left, top),
-                                  (right, bottom), (0, 255, 0), 2)
-                    cv2.putText(frame, "Present", (left, bottom + 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                    person_absent = False  # Set the flag to False as the person is identified as present
-                    return 'Present'
-                else:
-                    return 'Absent - Another person is detected or Not looking at the center'
+        if context is not None:
+            rgb_frame = context.rgb
+            face_locations = context.face_locations
         else:
-            return "Absent - No face detected"
+            import face_recognition
+
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(rgb_frame)
+
+        status, location = verify_identity(
+            known_encoding, rgb_frame, face_locations)
+        if status == ATTENDANCE_PRESENT and overlay is not None:
+            top, right, bottom, left = location
+            overlay.rectangle((left, top), (right, bottom), (0, 255, 0), 2)
+            overlay.text("Present", (left, bottom + 20), 0.9, (0, 255, 0), 2)
+        return status
 
     except Exception as e:
         print("An error occurred in mark attendance function: ", e)
+
+
+class AttendanceTracker:
+    """
+    The `AttendanceTracker` class marks attendance by verifying the candidate's identity once and then following
+    the verified face box across frames with a dlib correlation tracker. The expensive 128-d face encoding is only
+    recomputed when the track is lost, the box jumps, the number of faces changes, or the re-verification interval
+    passes. The statuses are the same strings returned by `mark_attendance`.
+    """
+
+    def __init__(self, known_encoding, reverify_interval=5.0, min_confidence=7.0, max_jump=0.5):
+        """
+        Args:
+            - known_encoding (numpy.ndarray): The known 128-dimension face encoding of the candidate.
+            - reverify_interval (float, optional): The maximum number of seconds between two identity checks.
+              Defaults to 5.
+            - min_confidence (float, optional): The tracker peak-to-sidelobe ratio below which the track is
+              considered lost. Defaults to 7.
+            - max_jump (float, optional): The largest movement of the box centre between two frames, as a fraction
+              of the box width, before the identity is checked again. Defaults to 0.5.
+        """
+        self.known_encoding = known_encoding
+        self.reverify_interval = reverify_interval
+        self.min_confidence = min_confidence
+        self.max_jump = max_jump
+        self.tracker = None
+        self.status = None
+        self.face_count = None
+        self.last_verified = None
+        self.last_box = None
+        self.verifications = 0
+
+    def reset(self):
+        """
+        Drops the current track so the next frame verifies the identity again.
+        """
+        self.tracker = None
+        self.status = None
+        self.last_box = None
+
+    def _needs_verification(self, rgb_frame, face_count, timestamp):
+        if self.status is None or face_count != self.face_count:
+            return True
+        if timestamp - self.last_verified >= self.reverify_interval:
+            return True
+        if self.tracker is None:
+            # Nothing to follow (e.g. no face at the last check), so the status only lives until the interval
+            return False
+
+        confidence = self.tracker.update(rgb_frame)
+        if confidence < self.min_confidence:
+            return True
+        box = self.tracker.get_position()
+        previous = self.last_box
+        self.last_box = box
+        jump = ((box.center().x - previous.center().x) ** 2 +
+                (box.center().y - previous.center().y) ** 2) ** 0.5
+        return jump > self.max_jump * max(previous.width(), 1.0)
+
+    def _verify(self, rgb_frame, face_locations, timestamp):
+        self.verifications += 1
+        status, location = verify_identity(
+            self.known_encoding, rgb_frame, face_locations)
+        self.status = status
+        self.face_count = len(face_locations)
+        self.last_verified = timestamp
+        self.tracker = None
+        self.last_box = None
+        if location is not None:
+            import dlib
+
+            top, right, bottom, left = location
+            self.tracker = dlib.correlation_tracker()
+            self.tracker.start_track(
+                rgb_frame, dlib.rectangle(left, top, right, bottom))
+            self.last_box = self.tracker.get_position()
+
+    async def mark_attendance(self, frame, context=None, timestamp=None):
+        """
+        Marks the attendance on one frame, re-running face recognition only when needed.
+
+        Args:
+            - frame (numpy.ndarray): An image frame in BGR format.
+            - context (FrameContext, optional): The shared per-frame context. Its face rectangles are used to
+              notice faces appearing or leaving without running the encoder.
+            - timestamp (float, optional): The capture time of the frame in seconds. Defaults to the current
+              monotonic time.
+
+        Returns:
+            str: The same attendance statuses as `mark_attendance`.
+        """
+        try:
+            if timestamp is None:
+                timestamp = time.monotonic()
+            if context is not None:
+                rgb_frame = context.rgb
+                face_locations = context.face_locations
+                face_count = len(face_locations)
+            else:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                face_locations = None
+                face_count = self.face_count
+
+            if self._needs_verification(rgb_frame, face_count, timestamp):
+                if face_locations is None:
+                    import face_recognition
+
+                    face_locations = face_recognition.face_locations(
+                        rgb_frame)
+                self._verify(rgb_frame, face_locations, timestamp)
+            return self.status
+
+        except Exception as e:
+            self.reset()
+            print("An error occurred in attendance tracker: ", e)
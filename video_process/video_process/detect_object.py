@@ -3,44 +3,106 @@
 import asyncio
 from datetime import datetime
 import cv2
-from ultralytics import YOLO
 from loggers.timer_decorator import timer_decorator
+from modules.voice_bot.video_process.batching import MicroBatcher
 
 
-async def process_frame_with_yolo(frame, model):
+# COCO class ids relevant to proctoring: person, laptop, cell phone, book
+PROCTORING_CLASSES = (0, 63, 67, 73)
+
+# The objects of interest are large in a webcam frame, so a small network input is enough
+PROCTORING_IMGSZ = 320
+
+
+def count_objects(result):
+    """
+    Counts the detections of each class name in a YOLO result.
+    """
+    detected_objects = [result.names[int(i)] for i in result.boxes.cls]
+    return {name: detected_objects.count(name) for name in detected_objects}
+
+
+class YoloBatcher(MicroBatcher):
+    """
+    The `YoloBatcher` class collects the frames submitted concurrently by many sessions and runs the proctoring
+    detection on all of them in one `predict` call, so the per-call overhead of the detector is shared.
+    """
+
+    def __init__(self, model, classes=PROCTORING_CLASSES, imgsz=PROCTORING_IMGSZ, max_batch=8, max_delay=0.0):
+        """
+        Args:
+            - model (YOLO): A YOLO model used only by this batcher.
+            - classes (sequence, optional): The class ids to detect. Defaults to `PROCTORING_CLASSES`.
+            - imgsz (int, optional): The network input size. Defaults to `PROCTORING_IMGSZ`.
+            - max_batch (int, optional): The maximum number of frames per call. Defaults to 8.
+            - max_delay (float, optional): How long in seconds to wait for more frames. Defaults to 0.
+        """
+        super().__init__(lambda frames: model.predict(frames, classes=list(classes), imgsz=imgsz, verbose=False),
+                         max_batch=max_batch, max_delay=max_delay, name="yolo-batcher")
+
+    def combine(self, inputs):
+        # Sessions may have different resolutions; YOLO letterboxes every frame of a list itself
+        return [frame for frames in inputs for frame in frames]
+
+
+async def detect_objects(frame, model, classes=None, imgsz=None, headless=False, batcher=None, overlay=None):
     """
     Perform object tracking on a frame using a YOLO model.
 
+    With `classes`, `imgsz`, `headless` or `batcher` set, the function runs in proctoring mode: a single `predict`
+    call restricted to the given classes at the given input size, without tracking, plotting or printing when
+    headless, and batched with the frames of other sessions when a batcher is given.
+
     Args:
         - frame (array): The input frame on which object tracking will be performed.
-        - model (YOLO): The YOLO model used for object tracking.
+        - model (YOLO): The YOLO model used for object tracking. Not used when `batcher` is given.
+        - classes (sequence, optional): The class ids to detect, e.g. `PROCTORING_CLASSES`. Defaults to all.
+        - imgsz (int, optional): The network input size, e.g. `PROCTORING_IMGSZ`. Defaults to the model's.
+        - headless (bool, optional): Skip drawing the detections and printing them. The input frame is returned
+          instead of an annotated one. Defaults to False.
+        - batcher (YoloBatcher, optional): A shared batcher that runs this frame with the frames of other
+          sessions; it applies its own classes and input size.
+        - overlay (Overlay, optional): Records the detection boxes and labels instead of plotting them on a new
+          frame. The input frame is returned.
 
     Returns:
-        - tuple: A tuple containing the annotated frame and a log message.
+        - tuple: A tuple containing the annotated frame, a log message and the count of each detected object.
 
     Example Usage:
         - frame = ...
         - model = YOLO(...)
-        - annotated_frame, log_message = process_frame_with_yolo(frame, model)
+        - annotated_frame, log_message, obj_counts = detect_objects(frame, model)
 
     Summary:
-        The `process_frame_with_yolo` function takes a frame and a YOLO model as inputs. It uses the YOLO model to perform object tracking on the frame and returns an annotated frame and a log message.
+        The `detect_objects` function takes a frame and a YOLO model as inputs. It uses the YOLO model to perform object tracking on the frame and returns an annotated frame, a log message and the object counts.
 
     Code Analysis:
         - The function uses the YOLO model to track objects in the input frame.
         - It extracts the names of the detected objects from the results.
         - It counts the occurrences of each detected object.
         - It formats the object counts into a log message.
-        - It returns the annotated frame and the log message.
+        - It returns the annotated frame, the log message and the counts.
 
     Outputs:
         annotated_frame (array): The input frame with bounding boxes and labels drawn around the detected objects.
         log_message (str): A log message containing the counts of each detected object.
+        obj_counts (dict): The number of detections of each object class name.
     """
     # print("Printing inside process_frame_with_yolo function")
 
-    # Run YOLOv8 tracking on the frame
-    results = model.track(frame, persist=False)
+    if batcher is not None:
+        results = batcher([frame])
+    elif classes is not None or imgsz is not None or headless:
+        # Only the options that are set are passed, so the model keeps its own defaults for the others
+        options = {}
+        if classes is not None:
+            options["classes"] = list(classes)
+        if imgsz is not None:
+            options["imgsz"] = imgsz
+        results = model.predict(frame, verbose=not headless, **options)
+    else:
+        # Run YOLOv8 tracking on the frame
+        results = model.track(frame, persist=False)
 
     # Debug: Print raw results from the model
     # print("Raw Model Results:", results)
@@ -48,24 +110,40 @@ async def process_frame_with_yolo(frame, model):
     # Take the first result if results is a list
     result = results[0] if isinstance(results, list) else results
 
-    # Extract detected object names
-    detected_objects = [result.names[int(i)] for i in result.boxes.cls]
+    # Count the detected object names
+    obj_counts = count_objects(result)
 
-    # Debug: Print all detected objects
-    print("All Detected Objects:", detected_objects)
+    # Format and log the information
+    log_message = f"{', '.join([f'{v} {k}' for k, v in obj_counts.items()])}"
 
-    obj_counts = {name: detected_objects.count(
-        name) for name in detected_objects}
+    if overlay is not None:
+        for (x1, y1, x2, y2), class_id in zip(result.boxes.xyxy.tolist(), result.boxes.cls.tolist()):
+            overlay.rectangle((int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
+            overlay.text(result.names[int(class_id)], (int(x1), max(int(y1) - 5, 0)), 0.6, (255, 0, 0), 2)
+    if headless or overlay is not None:
+        return frame, log_message, obj_counts
 
     # Debug: Print object counts
     print("Object Counts:", obj_counts)
 
-    # Format and log the information
-    log_message = f"{', '.join([f'{v} {k}' for k, v in obj_counts.items()])}"
-
     # Visualize the results on the frame
-    annotated_frame = results[0].plot()
+    annotated_frame = result.plot()
     # print("Printing inside process_frame_with_yolo function---------", log_message)
+    return annotated_frame, log_message, obj_counts
+
+
+async def process_frame_with_yolo(frame, model):
+    """
+    Perform object tracking on a frame using a YOLO model.
+
+    Args:
+        - frame (array): The input frame on which object tracking will be performed.
+        - model (YOLO): The YOLO model used for object tracking.
+
+    Returns:
+        - tuple: A tuple containing the annotated frame and a log message.
+    """
+    annotated_frame, log_message, _ = await detect_objects(frame, model)
     return annotated_frame, log_message
 
 
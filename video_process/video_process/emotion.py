@@ -1,49 +1,105 @@
 
 
 import cv2
-import dlib
-from imutils import face_utils
-from scipy.spatial import distance as dist
 import numpy as np
-from keras.models import load_model
 from loggers.timer_decorator import timer_decorator
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.batching import MicroBatcher
 
 
-async def process_emotion(frame, face_classifier, classifier, detector):
+EMOTION_LABELS = ['Angry', 'Disgust', 'Fear',
+                  'Happy', 'Neutral', 'Sad', 'Surprise']
+
+EMOTION_INPUT_SIZE = (224, 224)
+
+
+def extract_emotion_rois(gray, detected_faces):
+    """
+    Crops every detected face from the grayscale frame and stacks them into a single classifier input batch.
+
+    Args:
+        - gray (numpy.ndarray): The grayscale frame.
+        - detected_faces (sequence): The (x, y, w, h) boxes of the faces.
+
+    Returns:
+        numpy.ndarray: A float32 array of shape (N, 224, 224, 3) scaled to [0, 1].
+    """
+    if len(detected_faces) == 0:
+        return np.zeros((0,) + EMOTION_INPUT_SIZE + (3,), dtype=np.float32)
+    rois = np.stack([cv2.resize(gray[y:y+h, x:x+w], EMOTION_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+                     for (x, y, w, h) in detected_faces])
+    # Replicating the gray channel is what COLOR_GRAY2RGB does, without a per-face conversion
+    rois = rois.astype(np.float32) * np.float32(1.0 / 255.0)
+    return np.repeat(rois[..., np.newaxis], 3, axis=-1)
+
+
+def predict_emotion_labels(classifier, rois):
+    """
+    Classifies a batch of face ROIs with a single forward pass.
+
+    Args:
+        - classifier (keras.models.Model): A pre-trained emotion classifier model.
+        - rois (numpy.ndarray): The batch built by `extract_emotion_rois`, possibly from several frames or sessions.
+
+    Returns:
+        list: The emotion label of every ROI, in order.
     """
-    Detects faces in a given frame, extracts the facial region of interest (ROI), resizes it, and predicts the emotion using a pre-trained classifier model.
+    if len(rois) == 0:
+        return []
+    predictions = np.asarray(classifier.predict_on_batch(rois))
+    return [EMOTION_LABELS[index] for index in predictions.argmax(axis=1)]
+
+
+class EmotionBatcher(MicroBatcher):
+    """
+    The `EmotionBatcher` class collects face ROIs submitted concurrently by many frames or sessions and classifies
+    them together, so the fixed per-call overhead of Keras is paid once per batch instead of once per face.
+    """
+
+    def __init__(self, classifier, max_batch=32, max_delay=0.0):
+        """
+        Args:
+            - classifier (keras.models.Model): A pre-trained emotion classifier model.
+            - max_batch (int, optional): The maximum number of faces per forward pass. Defaults to 32.
+            - max_delay (float, optional): How long in seconds to wait for more faces. Defaults to 0.
+        """
+        super().__init__(lambda rois: predict_emotion_labels(classifier, rois),
+                         max_batch=max_batch, max_delay=max_delay, name="emotion-batcher")
+
+
+async def process_emotion(frame, face_classifier, classifier, detector, context=None, batcher=None, overlay=None):
+    """
+    Detects faces in a given frame, extracts the facial regions of interest (ROI), resizes them, and predicts the emotion of all faces with one batched call to a pre-trained classifier model.
 
     Args:
         - frame (numpy.ndarray): The input frame (image) in BGR format.
         - face_classifier (cv2.CascadeClassifier): A face classifier object used to detect faces in the frame.
         - classifier (keras.models.Model): A pre-trained emotion classifier model.
         - detector (dlib.fhog_object_detector): A face detector object used to ensure all detected faces have an emotion status.
+        - context (FrameContext, optional): The shared per-frame context. Built from the frame when not given.
+        - batcher (EmotionBatcher, optional): A shared batcher that merges the ROIs of this frame with those of other frames or sessions. When not given, the faces of this frame are classified in one call.
+        - overlay (Overlay, optional): Records the face boxes and labels when rendering is on. The frame itself is never drawn on.
 
     Returns:
-        tuple: A tuple containing the annotated frame and a list of emotion statuses for each detected face.
+        tuple: A tuple containing the frame and a list of emotion statuses for each detected face.
     """
-    emotion_labels = ['Angry', 'Disgust', 'Fear',
-                      'Happy', 'Neutral', 'Sad', 'Surprise']
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if context is None:
+        context = FrameContext(frame, detector, None)
+    gray = context.gray
     detected_faces = face_classifier.detectMultiScale(gray)
-    emotion_statuses = []
-    for (x, y, w, h) in detected_faces:
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 2)
-        roi_gray = gray[y:y+h, x:x+w]
-        roi_gray = cv2.resize(roi_gray, (224, 224),
-                              interpolation=cv2.INTER_AREA)
-        roi = cv2.cvtColor(roi_gray, cv2.COLOR_GRAY2RGB)
-        roi = roi.astype('float') / 255.0
-        roi = np.expand_dims(roi, axis=0)
-        prediction = classifier.predict(roi)[0]
-        emotion_status = emotion_labels[prediction.argmax()]
-        emotion_statuses.append(emotion_status)
-        label_position = (x, y)
-        cv2.putText(frame, emotion_status, label_position,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    rois = extract_emotion_rois(gray, detected_faces)
+    if batcher is not None:
+        emotion_statuses = batcher(rois)
+    else:
+        emotion_statuses = predict_emotion_labels(classifier, rois)
+
+    if overlay is not None:
+        for (x, y, w, h), emotion_status in zip(detected_faces, emotion_statuses):
+            overlay.rectangle((int(x), int(y)), (int(x + w), int(y + h)), (0, 255, 255), 2)
+            overlay.text(emotion_status, (int(x), int(y)), 1, (0, 255, 0), 2)
 
     # Ensure all detected faces have an emotion status
-    faces = detector(gray)
+    faces = context.faces
     while len(emotion_statuses) < len(faces):
         emotion_statuses.append("Neutral")
 
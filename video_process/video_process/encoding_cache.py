@@ -0,0 +1,158 @@
+
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FaceEncodingCache:
+    """
+    The `FaceEncodingCache` class stores known-candidate face encodings on disk, keyed by the SHA-256 of the
+    reference image bytes, so repeat interviews and worker restarts skip image decoding and face encoding.
+
+    The file is an append-only sequence of fixed-size records (a 32-byte digest followed by 128 little-endian
+    float64 values) after a short header. Only the record offsets are indexed at start-up; the vectors themselves
+    are read on demand and kept in a small in-memory LRU.
+    """
+
+    MAGIC = b"FENC\x01"
+    RECORD = struct.Struct("<32s128d")
+
+    def __init__(self, path, max_entries=256):
+        """
+        Args:
+            - path (str): The path of the cache file. It is created (with its directory) if it does not exist.
+            - max_entries (int, optional): The number of encodings kept in memory. Defaults to 256.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._offsets = {}
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @staticmethod
+    def digest(data):
+        """
+        Returns the cache key of the given image bytes.
+        """
+        return hashlib.sha256(data).digest()
+
+    def _load_index(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                self._reset()
+                return
+
+            with open(self.path, "rb") as file:
+                if file.read(len(self.MAGIC)) != self.MAGIC:
+                    # A foreign or corrupt file only costs the cached encodings, which are rebuilt on demand
+                    print(f"{self.path} is not a face encoding cache file, starting a new cache")
+                    self._reset()
+                    return
+                offset = len(self.MAGIC)
+                torn = False
+                while True:
+                    key = file.read(32)
+                    if len(key) < 32:
+                        torn = len(key) > 0
+                        break
+                    if len(file.read(self.RECORD.size - 32)) < self.RECORD.size - 32:
+                        torn = True
+                        break
+                    self._offsets[key] = offset
+                    offset += self.RECORD.size
+            if torn:
+                # A torn record at the end of the file (e.g. after a crash) is cut off, or every record appended
+                # after it would be read at the wrong offset
+                print(f"Truncating a partial record at the end of {self.path}")
+                os.truncate(self.path, offset)
+
+    def _reset(self):
+        """
+        Replaces the cache file with an empty one.
+        """
+        self._offsets.clear()
+        with open(self.path, "wb") as file:
+            file.write(self.MAGIC)
+
+    def _remember(self, key, encoding):
+        self._lru[key] = encoding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, key):
+        """
+        Looks up an encoding by digest.
+
+        Args:
+            - key (bytes): The digest returned by `digest`.
+
+        Returns:
+            numpy.ndarray: The 128-dimension encoding, or None if it is not cached.
+        """
+        with self._lock:
+            encoding = self._lru.get(key)
+            if encoding is not None:
+                self._lru.move_to_end(key)
+                return encoding
+            offset = self._offsets.get(key)
+            if offset is None:
+                return None
+            with open(self.path, "rb") as file:
+                file.seek(offset)
+                record = self.RECORD.unpack(file.read(self.RECORD.size))
+            encoding = np.array(record[1:], dtype=np.float64)
+            self._remember(key, encoding)
+            return encoding
+
+    def put(self, key, encoding):
+        """
+        Stores an encoding in memory and appends it to the cache file.
+
+        Args:
+            - key (bytes): The digest returned by `digest`.
+            - encoding (numpy.ndarray): The 128-dimension face encoding.
+        """
+        encoding = np.asarray(encoding, dtype=np.float64)
+        with self._lock:
+            self._remember(key, encoding)
+            if key in self._offsets:
+                return
+            # In append mode the position after the write is the end of our record, even if another worker
+            # appended to the file since it was opened
+            with open(self.path, "ab") as file:
+                file.write(self.RECORD.pack(key, *encoding))
+                file.flush()
+                self._offsets[key] = file.tell() - self.RECORD.size
+
+    def __len__(self):
+        return len(self._offsets)
+
+
+_default_cache = None
+
+
+def get_default_encoding_cache():
+    """
+    Returns the process-wide encoding cache, stored at `FACE_ENCODING_CACHE_PATH` or
+    `modules/voice_bot/cache/face_encodings.bin` by default, or None if the cache file cannot be opened.
+    """
+    global _default_cache
+    if _default_cache is None:
+        try:
+            _default_cache = FaceEncodingCache(os.getenv(
+                "FACE_ENCODING_CACHE_PATH", r"modules/voice_bot/cache/face_encodings.bin"))
+        except OSError as e:
+            # Encodings are still computed, just not cached
+            print(f"The face encoding cache is unavailable: {e}")
+            return None
+    return _default_cache
@@ -2,9 +2,9 @@ from loggers.timer_decorator import timer_decorator
 
 
 import cv2
-from imutils import face_utils
-from scipy.spatial import distance as dist
 import numpy as np
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.geometry import eye_aspect_ratios
 
 
 async def EAR_cal(eye):
@@ -17,14 +17,16 @@ async def EAR_cal(eye):
     Returns:
         - float: The Eye Aspect Ratio (EAR) value.
     """
-    v1 = dist.euclidean(eye[1], eye[5])
-    v2 = dist.euclidean(eye[2], eye[4])
-    h1 = dist.euclidean(eye[0], eye[3])
+    # Lists of (x, y) tuples are accepted as well as landmark arrays
+    eye = np.asarray(eye, dtype=np.float64)
+    v1 = np.linalg.norm(eye[1] - eye[5])
+    v2 = np.linalg.norm(eye[2] - eye[4])
+    h1 = np.linalg.norm(eye[0] - eye[3])
     ear = (v1 + v2) / h1
     return ear
 
 
-async def process_blink(frame, detector, lm_model, L_start, L_end, R_start, R_end):
+async def process_blink(frame, detector, lm_model, L_start, L_end, R_start, R_end, context=None):
     """
     Process the frame to detect faces, extract the landmarks of the eyes, calculate the Eye Aspect Ratio (EAR) for each eye,
     determine if the eyes are blinking or not based on a threshold, and return the frame with the blink statuses for each detected face.
@@ -37,26 +39,18 @@ async def process_blink(frame, detector, lm_model, L_start, L_end, R_start, R_en
         - L_end (int): An integer representing the ending index of the left eye landmarks.
         - R_start (int): An integer representing the starting index of the right eye landmarks.
         - R_end (int): An integer representing the ending index of the right eye landmarks.
+        - context (FrameContext, optional): The shared per-frame context. Built from the frame when not given.
 
     Returns:
         tuple: A tuple containing the frame with the blink statuses for each detected face and a list of strings representing the blink statuses for each detected face.
     """
-    img_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = detector(img_gray)
-    blink_statuses = []
-    for face in faces:
-        shapes = lm_model(img_gray, face)
-        shape = face_utils.shape_to_np(shapes)
-        lefteye = shape[L_start:L_end]
-        righteye = shape[R_start:R_end]
-        left_EAR = await EAR_cal(lefteye)
-        right_EAR = await EAR_cal(righteye)
-        avg = (left_EAR + right_EAR) / 2
-        blink_thresh = 0.5
-        blink_status = "Not Blinking"
-        if avg < blink_thresh:
-            blink_status = "Blinking"
-        blink_statuses.append(blink_status)
+    if context is None:
+        context = FrameContext(frame, detector, lm_model)
+    faces = context.faces
+    blink_thresh = 0.5
+    # The EAR of every face is computed in one pass over the (N_faces, 68, 2) landmark array
+    averages = eye_aspect_ratios(context.landmarks, slice(L_start, L_end), slice(R_start, R_end))
+    blink_statuses = ["Blinking" if avg < blink_thresh else "Not Blinking" for avg in averages]
 
     # Ensure all detected faces have a blink status
     while len(blink_statuses) < len(faces):
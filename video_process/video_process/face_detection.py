@@ -0,0 +1,96 @@
+
+
+import cv2
+
+
+class ScaledFaceDetector:
+    """
+    The `ScaledFaceDetector` class wraps the dlib HOG face detector so it runs on fewer pixels. The detector cost
+    grows with the pixel count, while interview faces are large and centered, so detection runs on a downscaled copy
+    of the frame and, once a face is known, only inside a region of interest around it. The rectangles are mapped
+    back to full-resolution coordinates, so landmarks are still predicted on the full frame.
+
+    It is called like the dlib detector (`detector(gray)`) and can be passed to `FrameContext` in its place. It keeps
+    the last face positions, so each session needs its own instance; the wrapped dlib detector can be shared.
+    """
+
+    def __init__(self, detector, scale=0.5, roi=True, roi_margin=0.5, roi_scale=None, full_frame_interval=30):
+        """
+        Args:
+            - detector (dlib.fhog_object_detector): The detector to run on the reduced image.
+            - scale (float, optional): The resize factor of full-frame detection. 1 disables downscaling. The dlib
+              detector finds faces of about 80x80 pixels and more, so faces must stay that large after scaling.
+              Defaults to 0.5.
+            - roi (bool, optional): Search only around the last known faces when there are any. Defaults to True.
+            - roi_margin (float, optional): How far the region of interest extends around the last faces, as a
+              fraction of their size on each side. Defaults to 0.5.
+            - roi_scale (float, optional): The resize factor inside the region of interest. Defaults to `scale`.
+            - full_frame_interval (int, optional): Search the whole frame at least every this many frames, so new
+              faces entering the picture are found. Defaults to 30.
+        """
+        self.detector = detector
+        self.scale = scale
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.roi_scale = roi_scale
+        self.full_frame_interval = full_frame_interval
+        self._last_faces = []
+        self._frames_since_full = 0
+
+    @property
+    def last_faces(self):
+        """list: The face rectangles of the last frame, in full-resolution coordinates."""
+        return list(self._last_faces)
+
+    def reset(self):
+        """
+        Forgets the last face positions, e.g. when the video source changes.
+        """
+        self._last_faces = []
+        self._frames_since_full = 0
+
+    def _detect(self, gray, left, top, scale):
+        import dlib
+
+        if scale != 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        rectangles = dlib.rectangles()
+        for face in self.detector(gray):
+            rectangles.append(dlib.rectangle(
+                int(face.left() / scale) + left, int(face.top() / scale) + top,
+                int(face.right() / scale) + left, int(face.bottom() / scale) + top))
+        return rectangles
+
+    def _region(self, shape):
+        height, width = shape[:2]
+        left = min(face.left() for face in self._last_faces)
+        top = min(face.top() for face in self._last_faces)
+        right = max(face.right() for face in self._last_faces)
+        bottom = max(face.bottom() for face in self._last_faces)
+        margin_x = int((right - left) * self.roi_margin)
+        margin_y = int((bottom - top) * self.roi_margin)
+        return (max(left - margin_x, 0), max(top - margin_y, 0),
+                min(right + margin_x, width), min(bottom + margin_y, height))
+
+    def __call__(self, gray):
+        """
+        Detects the faces of a grayscale frame.
+
+        Args:
+            - gray (numpy.ndarray): The full-resolution grayscale frame.
+
+        Returns:
+            dlib.rectangles: The face rectangles in full-resolution coordinates.
+        """
+        faces = None
+        self._frames_since_full += 1
+        if self.roi and self._last_faces and self._frames_since_full < self.full_frame_interval:
+            left, top, right, bottom = self._region(gray.shape)
+            if right - left > 1 and bottom - top > 1:
+                faces = self._detect(gray[top:bottom, left:right], left, top, self.roi_scale or self.scale)
+        if not faces:
+            # No face known, the face left the region, or a periodic full search
+            faces = self._detect(gray, 0, 0, self.scale)
+            self._frames_since_full = 0
+        self._last_faces = list(faces)
+        return faces
@@ -0,0 +1,94 @@
+
+
+import cv2
+import numpy as np
+from imutils import face_utils
+
+
+class FrameContext:
+    """
+    The `FrameContext` class holds everything the analyzers derive from a single video frame: the grayscale and RGB
+    conversions, the dlib face rectangles and the 68-point landmarks of every face. Each value is computed lazily on
+    first access and then reused, so the expensive HOG detection and landmark prediction run once per frame instead
+    of once per analyzer.
+    """
+
+    def __init__(self, frame, detector, lm_model):
+        """
+        Initializes the context for one frame.
+
+        Args:
+            - frame (numpy.ndarray): The input frame in BGR format.
+            - detector (dlib.fhog_object_detector): The face detector used to find faces in the frame.
+            - lm_model (dlib.shape_predictor): The 68-point landmark model applied to every detected face.
+        """
+        self.frame = frame
+        self.detector = detector
+        self.lm_model = lm_model
+        self._gray = None
+        self._rgb = None
+        self._faces = None
+        self._shapes = None
+        self._landmarks = None
+
+    @property
+    def gray(self):
+        """numpy.ndarray: The frame converted to grayscale."""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def rgb(self):
+        """numpy.ndarray: The frame converted to RGB (as face_recognition and mediapipe require)."""
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def faces(self):
+        """dlib.rectangles: The face rectangles found by the detector on the grayscale frame."""
+        if self._faces is None:
+            self._faces = self.detector(self.gray)
+        return self._faces
+
+    @property
+    def shapes(self):
+        """list: The dlib landmark objects, one per face in `faces`."""
+        if self._shapes is None:
+            self._shapes = [self.lm_model(self.gray, face)
+                            for face in self.faces]
+        return self._shapes
+
+    @property
+    def landmarks(self):
+        """numpy.ndarray: An (N_faces, 68, 2) integer array with the landmark coordinates of every face."""
+        if self._landmarks is None:
+            if self.shapes:
+                self._landmarks = np.stack(
+                    [face_utils.shape_to_np(shape) for shape in self.shapes])
+            else:
+                self._landmarks = np.zeros((0, 68, 2), dtype=int)
+        return self._landmarks
+
+    @property
+    def face_locations(self):
+        """
+        list: The face rectangles as (top, right, bottom, left) tuples clipped to the frame, the format
+        expected by `face_recognition.face_encodings`.
+        """
+        height, width = self.frame.shape[:2]
+        return [(max(face.top(), 0), min(face.right(), width),
+                 min(face.bottom(), height), max(face.left(), 0))
+                for face in self.faces]
+
+    def prepare(self):
+        """
+        Computes every lazy value up front so the context can be shared read-only by concurrent analyzers.
+
+        Returns:
+            FrameContext: The same context, for chaining.
+        """
+        self.rgb
+        self.landmarks
+        return self
@@ -0,0 +1,235 @@
+
+
+import asyncio
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def decode_frame(data, reduced=False):
+    """
+    Decodes a JPEG (or any image format OpenCV reads) into a BGR frame.
+
+    Args:
+        - data (bytes): The encoded image.
+        - reduced (bool, optional): Decode at half resolution, which libjpeg does during decoding at a fraction of
+          the cost of a full decode followed by a resize. Only for large frames: the landmark thresholds of the
+          mouth and head pose analyzers are in pixels, and dlib misses faces smaller than about 80 px. Defaults to
+          False.
+
+    Returns:
+        numpy.ndarray: The decoded frame, or None if the data is not a valid image.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_REDUCED_COLOR_2 if reduced else cv2.IMREAD_COLOR)
+
+
+class LatestFrameQueue:
+    """
+    The `LatestFrameQueue` class is a small bounded queue for live frames. When it is full, the oldest frame is
+    dropped to make room for the new one, so a slow consumer analyzes fewer, recent frames instead of falling further
+    and further behind the live stream.
+    """
+
+    def __init__(self, maxsize=2):
+        """
+        Args:
+            - maxsize (int, optional): The maximum number of frames waiting to be analyzed. Defaults to 2.
+        """
+        self._items = deque(maxlen=maxsize)
+        self._available = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """
+        Adds a frame, dropping the oldest waiting frame if the queue is full. Never blocks.
+        """
+        if len(self._items) == self._items.maxlen:
+            self.dropped += 1
+        self._items.append(item)
+        self.received += 1
+        self._available.set()
+
+    def close(self):
+        """
+        Wakes up the consumer; `get` returns None once the remaining frames are consumed.
+        """
+        self._closed = True
+        self._available.set()
+
+    def peek(self):
+        """
+        Returns the oldest waiting frame without removing it, or None if there is none.
+        """
+        return self._items[0] if self._items else None
+
+    def get_nowait(self):
+        """
+        Returns the oldest waiting frame, or None if there is none.
+        """
+        return self._items.popleft() if self._items else None
+
+    @property
+    def closed(self):
+        """bool: Whether `close` was called."""
+        return self._closed
+
+    async def get(self):
+        """
+        Waits for the oldest waiting frame.
+
+        Returns:
+            The frame, or None when the queue is closed and empty.
+        """
+        while not self._items:
+            if self._closed:
+                return None
+            self._available.clear()
+            await self._available.wait()
+        return self._items.popleft()
+
+
+def frame_statuses(results):
+    """
+    Returns the statuses of one analyzed frame (first face, as in the event log) as a JSON-serializable dict.
+    """
+    def first(statuses):
+        return statuses[0] if statuses else None
+
+    _, _, obj_counts = results["objects"]
+    _, movement_message, _ = results["posture"]
+    return {
+        "attendance": results["attendance"],
+        "faces": len(results["blink"][1]),
+        "blink": first(results["blink"][1]),
+        "gaze": first(results["gaze"][1]),
+        "mouth": first(results["mouth"][1]),
+        "emotion": first(results["emotion"][1]),
+        "headpose": results["headpose"][1],
+        "objects": obj_counts,
+        "posture": movement_message,
+        # The other analyzers repeat their last result, or report "Unknown" while disabled
+        "measured": sorted(results["measured"]) if "measured" in results else None,
+    }
+
+
+class FrameStream:
+    """
+    The `FrameStream` class analyzes the live frames of one session as fast as the pipeline allows. Encoded frames
+    are queued as they arrive; the analysis loop always takes the oldest of the few queued frames, decodes it (only
+    analyzed frames are decoded) and runs it through the session's `VideoProcessor`. Under load, frames are dropped
+    at the queue, so the analysis stays close to live instead of falling minutes behind.
+    """
+
+    def __init__(self, processor, image_encoding, queue_size=2, reduced_decode=False, result_interval=None):
+        """
+        Args:
+            - processor (VideoProcessor): The processor of the session.
+            - image_encoding (numpy.ndarray): The known face encoding of the candidate.
+            - queue_size (int, optional): The frames allowed to wait for analysis. Defaults to 2.
+            - reduced_decode (bool, optional): Decode frames at half resolution. Defaults to False.
+            - result_interval (float, optional): Report once per this many seconds (the events of the interval and
+              the session counters) instead of after every frame. Defaults to None (every frame).
+        """
+        self.processor = processor
+        self.image_encoding = image_encoding
+        self.queue = LatestFrameQueue(queue_size)
+        self.reduced_decode = reduced_decode
+        self.result_interval = result_interval
+        self.analyzed = 0
+        self.invalid = 0
+
+    def push(self, data, timestamp=None):
+        """
+        Queues an encoded frame received from the client.
+
+        Args:
+            - data (bytes): The encoded frame.
+            - timestamp (float, optional): The capture time of the frame in seconds. Defaults to now.
+        """
+        self.queue.put((time.time() if timestamp is None else timestamp, data))
+
+    def close(self):
+        """
+        Ends the stream once the queued frames are analyzed.
+        """
+        self.queue.close()
+
+    async def aclose(self):
+        """
+        Ends the stream. The frames are analyzed by the caller's own `results` loop, so nothing else can still be
+        using the processor once that loop has stopped.
+        """
+        self.close()
+
+    def stats(self):
+        return {
+            "received": self.queue.received,
+            "dropped": self.queue.dropped,
+            "analyzed": self.analyzed,
+            "invalid": self.invalid,
+            "unchanged": self.processor.motion_gate.skipped if self.processor.motion_gate is not None else 0,
+            "quality": self.processor.load_shedder.level if self.processor.load_shedder is not None else 0,
+        }
+
+    async def analyzed_frames(self):
+        """
+        Decodes and analyzes the queued frames until the stream is closed.
+
+        Yields:
+            tuple: The timestamp and the results of every analyzed frame.
+        """
+        engine = self.processor.engine
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            timestamp, data = item
+            frame = await engine.run_in_thread(decode_frame, data, self.reduced_decode)
+            if frame is None:
+                self.invalid += 1
+                continue
+            yield timestamp, await self.processor.analyze_frame(self.image_encoding, frame, timestamp)
+
+    async def results(self):
+        """
+        Analyzes the queued frames until the stream is closed.
+
+        Yields:
+            dict: One report per analyzed frame (or per `result_interval`) with the timestamp, the transition
+            events, the frame statuses, the lag behind live in seconds and the stream statistics.
+        """
+        events = []
+        last_report = None
+        async for timestamp, results in self.analyzed_frames():
+            self.analyzed += 1
+            log_message = self.processor.event_message(results)
+            if log_message is not None:
+                self.processor.log_sink.emit(log_message)
+                events.append(log_message)
+
+            if self.result_interval is not None:
+                if last_report is None:
+                    last_report = timestamp
+                if timestamp - last_report < self.result_interval:
+                    continue
+                last_report = timestamp
+            report = {
+                "timestamp": timestamp,
+                "events": events,
+                "lag": time.time() - timestamp,
+                "stats": self.stats(),
+            }
+            if self.result_interval is None:
+                report["statuses"] = frame_statuses(results)
+            else:
+                report["counters"] = self.processor.temporal.counters(timestamp)
+            events = []
+            yield report
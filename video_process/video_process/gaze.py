@@ -1,8 +1,9 @@
 
 
 import cv2
-from scipy.spatial import distance as dist
 import numpy as np
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.geometry import eye_boxes
 
 
 async def detect_gaze_direction(pupil_x, w):
@@ -20,20 +21,16 @@ async def get_eye_region(eye_points, shape):
     return np.array(eye_region, np.int32)
 
 
-async def process_gaze(frame, detector, predictor):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = detector(gray)
+async def process_gaze(frame, detector, predictor, context=None):
+    if context is None:
+        context = FrameContext(frame, detector, predictor)
+    gray = context.gray
+    faces = context.faces
     gaze_directions = []
-    for face in faces:
-        shape = predictor(gray, face)
-        left_eye_region = await get_eye_region(list(range(36, 42)), shape)
-        right_eye_region = await get_eye_region(list(range(42, 48)), shape)
+    # The eye boxes of every face are computed in one pass; only the pupil search needs a per-eye loop
+    for boxes in eye_boxes(context.landmarks).tolist():
         gaze_status = "Center"
-        for eye_region in [left_eye_region, right_eye_region]:
-            eye_x = min(eye_region[:, 0])
-            eye_y = min(eye_region[:, 1])
-            eye_w = max(eye_region[:, 0]) - eye_x
-            eye_h = max(eye_region[:, 1]) - eye_y
+        for eye_x, eye_y, eye_w, eye_h in boxes:
             roi_eye = gray[eye_y:eye_y + eye_h, eye_x:eye_x + eye_w]
             _, thresh_eye = cv2.threshold(
                 roi_eye, 30, 255, cv2.THRESH_BINARY_INV)
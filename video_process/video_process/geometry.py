@@ -0,0 +1,146 @@
+
+
+import numpy as np
+
+
+# Index ranges of the dlib 68-point landmark model
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+TOP_LIP = slice(50, 53)
+BOTTOM_LIP = slice(56, 59)
+NOSE_TIP = 33
+
+# Every function below works on the last two axes of the landmark array, so the same call handles the faces of one
+# frame, shaped (N_faces, 68, 2), or the faces of a batch of frames, shaped (N_frames, N_faces, 68, 2).
+
+
+def eye_aspect_ratios(landmarks, left=LEFT_EYE, right=RIGHT_EYE):
+    """
+    Computes the average Eye Aspect Ratio (EAR) of both eyes of every face.
+
+    Args:
+        - landmarks (numpy.ndarray): A (..., 68, 2) landmark array.
+        - left (slice, optional): The landmark range of the left eye. Defaults to `LEFT_EYE`.
+        - right (slice, optional): The landmark range of the right eye. Defaults to `RIGHT_EYE`.
+
+    Returns:
+        numpy.ndarray: A (...) array with the average EAR of each face.
+    """
+    # (..., 2 eyes, 6 points, 2)
+    eyes = np.stack([landmarks[..., left, :], landmarks[..., right, :]], axis=-3).astype(np.float64)
+    v1 = np.linalg.norm(eyes[..., 1, :] - eyes[..., 5, :], axis=-1)
+    v2 = np.linalg.norm(eyes[..., 2, :] - eyes[..., 4, :], axis=-1)
+    h1 = np.linalg.norm(eyes[..., 0, :] - eyes[..., 3, :], axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ears = (v1 + v2) / h1
+    return ears.mean(axis=-1)
+
+
+def lip_gaps(landmarks):
+    """
+    Computes the vertical distance between the mean of the inner top lip and the inner bottom lip of every face.
+
+    Args:
+        - landmarks (numpy.ndarray): A (..., 68, 2) landmark array.
+
+    Returns:
+        numpy.ndarray: A (...) array with the lip gap of each face, in pixels.
+    """
+    top = landmarks[..., TOP_LIP, 1].mean(axis=-1)
+    bottom = landmarks[..., BOTTOM_LIP, 1].mean(axis=-1)
+    return np.abs(top - bottom)
+
+
+def eye_boxes(landmarks):
+    """
+    Computes the bounding box of both eyes of every face.
+
+    Args:
+        - landmarks (numpy.ndarray): A (..., 68, 2) landmark array.
+
+    Returns:
+        numpy.ndarray: A (..., 2, 4) integer array with the (x, y, width, height) box of the left and right eye.
+    """
+    eyes = np.stack([landmarks[..., LEFT_EYE, :], landmarks[..., RIGHT_EYE, :]], axis=-3).astype(np.int32)
+    low = eyes.min(axis=-2)
+    high = eyes.max(axis=-2)
+    return np.concatenate([low, high - low], axis=-1)
+
+
+def face_boxes(faces):
+    """
+    Converts dlib face rectangles to an (N_faces, 4) integer array of (left, top, right, bottom).
+    """
+    if len(faces) == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    return np.array([(face.left(), face.top(), face.right(), face.bottom()) for face in faces], dtype=np.int64)
+
+
+def head_pose_offsets(landmarks, boxes):
+    """
+    Computes the offset of the nose tip from the center of the face rectangle of every face.
+
+    Args:
+        - landmarks (numpy.ndarray): A (..., 68, 2) landmark array.
+        - boxes (numpy.ndarray): The matching (..., 4) face rectangles as (left, top, right, bottom).
+
+    Returns:
+        numpy.ndarray: A (..., 2) integer array with the (x, y) offset of each face, in pixels.
+    """
+    # dlib rectangles are inclusive, so the width is right - left + 1
+    centers = boxes[..., :2] + (boxes[..., 2:] - boxes[..., :2] + 1) // 2
+    return landmarks[..., NOSE_TIP, :].astype(np.int64) - centers
+
+
+def head_pose_directions(offsets, threshold=20):
+    """
+    Turns nose offsets into head pose directions such as "Left ", "Down" or "Right Up".
+
+    Args:
+        - offsets (numpy.ndarray): An (N, 2) array returned by `head_pose_offsets`.
+        - threshold (int, optional): The offset in pixels below which an axis is considered centered. Defaults to 20.
+
+    Returns:
+        list: The direction of each face.
+    """
+    offsets = np.asarray(offsets).reshape(-1, 2)
+    horizontal = np.where(offsets[:, 0] > 0, "Left ", "Right ")
+    vertical = np.where(offsets[:, 1] > 0, "Down", "Up")
+    directions = []
+    for (x_diff, y_diff), x_name, y_name in zip(np.abs(offsets) > threshold, horizontal, vertical):
+        direction = (x_name if x_diff else "") + (y_name if y_diff else "")
+        directions.append(direction or "Center")
+    return directions
+
+
+def joint_angles(first, joint, last):
+    """
+    Computes the angle at `joint` between the segments to `first` and `last`, for any number of joints at once.
+
+    Args:
+        - first (numpy.ndarray): A (..., 2) array of points.
+        - joint (numpy.ndarray): The matching (..., 2) array of joints.
+        - last (numpy.ndarray): The matching (..., 2) array of points.
+
+    Returns:
+        numpy.ndarray: A (...) array of angles in degrees.
+    """
+    a = np.asarray(first, dtype=np.float64) - joint
+    b = np.asarray(last, dtype=np.float64) - joint
+    cosine = np.sum(a * b, axis=-1) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1))
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def shoulder_angles(points):
+    """
+    Computes the left and right shoulder angles (elbow, shoulder, hip) of one or more poses.
+
+    Args:
+        - points (numpy.ndarray): A (..., 2 sides, 3 joints, 2) array with the (elbow, shoulder, hip) coordinates
+          of the left and the right side.
+
+    Returns:
+        numpy.ndarray: A (..., 2) array with the left and right shoulder angles in degrees.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    return joint_angles(points[..., 0, :], points[..., 1, :], points[..., 2, :])
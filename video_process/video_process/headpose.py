@@ -1,46 +1,26 @@
 
 import cv2
 from loggers.timer_decorator import timer_decorator
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.geometry import NOSE_TIP, face_boxes, head_pose_directions, head_pose_offsets
 
 
-async def headpose_process(frame, detector, predictor):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = detector(gray)
+async def headpose_process(frame, detector, predictor, context=None, overlay=None):
+    if context is None:
+        context = FrameContext(frame, detector, predictor)
     direction = "Center"
 
-    for face in faces:
-        landmarks = predictor(gray, face)
+    # Head pose estimation (using nose and face rectangle) for every face in one pass
+    landmarks = context.landmarks
+    offsets = head_pose_offsets(landmarks, face_boxes(context.faces))
+    directions = head_pose_directions(offsets)
 
-        # Nose tip (landmark 34)
-        nose = (landmarks.part(33).x, landmarks.part(33).y)
-        cv2.circle(frame, nose, 2, (0, 255, 0), -1)
+    for nose, offset, direction in zip(landmarks[:, NOSE_TIP].tolist(), offsets.tolist(), directions):
 
-        # Head pose estimation (using nose and face rectangle)
-        face_center = (face.left() + face.width() // 2,
-                       face.top() + face.height() // 2)
-        cv2.circle(frame, face_center, 2, (0, 0, 255), -1)
-
-        x_diff = nose[0] - face_center[0]
-        y_diff = nose[1] - face_center[1]
-
-        direction = ""
-
-        if abs(x_diff) > 20:  # Threshold to eliminate noise
-            if x_diff > 0:
-                direction += "Left "
-            else:
-                direction += "Right "
-
-        if abs(y_diff) > 20:  # Threshold to eliminate noise
-            if y_diff > 0:
-                direction += "Down"
-            else:
-                direction += "Up"
-
-        if direction == "":
-            direction = "Center"
-
-        cv2.putText(frame, direction, (50, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        if overlay is not None:
+            # Nose tip (landmark 34) and face center
+            overlay.circle(tuple(nose), 2, (0, 255, 0), -1)
+            overlay.circle((nose[0] - offset[0], nose[1] - offset[1]), 2, (0, 0, 255), -1)
+            overlay.text(direction, (50, 50), 1, (0, 255, 0), 2)
 
     return frame, direction
@@ -0,0 +1,64 @@
+
+
+import os
+
+import numpy as np
+
+
+# Runtimes the learned models (emotion classifier, YOLO) can run on
+BACKENDS = ("keras", "onnx", "onnx-int8")
+
+DEFAULT_BACKEND = "keras"
+
+
+def get_inference_backend():
+    """
+    Returns the inference backend selected with the VIDEO_INFERENCE_BACKEND environment variable.
+    """
+    backend = os.environ.get("VIDEO_INFERENCE_BACKEND", DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    return backend
+
+
+def onnx_path(path, backend):
+    """
+    Returns the exported ONNX file of a model for an ONNX backend, e.g. `Emotion_Detection.h5` becomes
+    `Emotion_Detection.onnx`, or `Emotion_Detection.int8.onnx` for the quantized backend.
+    """
+    stem = os.path.splitext(path)[0]
+    return f"{stem}.int8.onnx" if backend == "onnx-int8" else f"{stem}.onnx"
+
+
+class OnnxClassifier:
+    """
+    The `OnnxClassifier` class runs an exported classifier on ONNX Runtime behind the `predict_on_batch` method the
+    analyzers call on a Keras model, so the emotion analyzer and its batcher work unchanged on either runtime.
+    """
+
+    def __init__(self, path, threads=None):
+        """
+        Args:
+            - path (str): The exported `.onnx` model.
+            - threads (int, optional): The intra-op threads of the session. Defaults to ONNX Runtime's choice.
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, inputs):
+        """
+        Runs one forward pass on a batch.
+
+        Args:
+            - inputs (numpy.ndarray): The batch, with the shape and dtype of the original model's input.
+
+        Returns:
+            numpy.ndarray: The model output of every input row.
+        """
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(inputs, dtype=np.float32)})[0]
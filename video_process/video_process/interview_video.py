@@ -2,22 +2,85 @@
 
 import asyncio
 import os
+import time
+import numpy as np
 from modules.voice_bot.video_process.headpose import headpose_process
 from modules.voice_bot.video_process.emotion import process_emotion
 from modules.voice_bot.video_process.eye_blink import process_blink
 from modules.voice_bot.video_process.gaze import process_gaze
 from modules.voice_bot.video_process.mouth_blink import process_mouth
-import cv2
-import dlib
 from imutils import face_utils
 from datetime import datetime
-from keras.models import load_model
-from loggers.logger import log_event
-from modules.voice_bot.video_process.detect_object import process_frame_with_yolo
+from modules.voice_bot.video_process.detect_object import detect_objects
 from modules.voice_bot.video_process.body_postures import body_posture
-import mediapipe as mp
-from modules.voice_bot.video_process.detect_face import mark_attendance
-from ultralytics import YOLO
+from modules.voice_bot.video_process.detect_face import (ATTENDANCE_NO_FACE, ATTENDANCE_OTHER_PERSON,
+                                                         ATTENDANCE_PRESENT, AttendanceTracker, mark_attendance)
+from modules.voice_bot.video_process.attendance_index import identify_faces
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.face_detection import ScaledFaceDetector
+from modules.voice_bot.video_process.analyzer_engine import AnalyzerCall, get_default_engine
+from modules.voice_bot.video_process.analyzer_schedule import AnalyzerSchedule
+from modules.voice_bot.video_process.model_registry import get_model_registry
+from modules.voice_bot.video_process.log_sink import get_log_sink
+from modules.voice_bot.video_process.timeline import EventTimeline
+from modules.voice_bot.video_process.temporal import TemporalEvents
+from modules.voice_bot.video_process.overlay import Overlay, compose
+from modules.voice_bot.video_process.motion_gate import MotionGate
+from modules.voice_bot.video_process.load_shedder import LoadShedder
+
+
+SUMMARY_LOG = r"modules/voice_bot/log_files/full_logs_toget_summary.txt"
+BULLET_POINTS_LOG = r"modules/voice_bot/log_files/full_logs_toget_bullet_pts.txt"
+# The structured event timelines of the live sessions, one file per session
+TIMELINE_DIR = r"modules/voice_bot/log_files/timelines"
+
+
+def session_timeline_path(session_id):
+    """
+    Returns a new file for the event timeline of a live session, under `TIMELINE_DIR`. The current time is part of the
+    name, so a session that reconnects does not overwrite its earlier timeline.
+    """
+    os.makedirs(TIMELINE_DIR, exist_ok=True)
+    return os.path.join(TIMELINE_DIR, f"session_{session_id}_{datetime.now():%Y%m%d_%H%M%S}.timeline")
+
+
+ANALYZERS = ("blink", "gaze", "mouth", "emotion",
+             "headpose", "objects", "posture", "attendance")
+
+# Results used for an analyzer that has not run yet
+EMPTY_RESULTS = {
+    "blink": (None, []),
+    "gaze": (None, []),
+    "mouth": (None, []),
+    "emotion": (None, []),
+    "headpose": (None, "Center"),
+    "objects": (None, "", {}),
+    "posture": (None, "", None),
+    "attendance": None,
+}
+
+# Status used for a face that a carried-forward per-face result does not cover
+PER_FACE_FILLERS = {
+    "blink": "Not Blinking",
+    "gaze": "Center",
+    "mouth": "Closed",
+    "emotion": "Neutral",
+}
+
+# Status of an analyzer that is disabled (rate 0, e.g. by the load shedder). Nothing is measured, so its last result
+# is not carried forward as if it still held.
+UNKNOWN_STATUS = "Unknown"
+
+DISABLED_RESULTS = {
+    "blink": (None, []),
+    "gaze": (None, []),
+    "mouth": (None, []),
+    "emotion": (None, []),
+    "headpose": (None, UNKNOWN_STATUS),
+    "objects": (None, UNKNOWN_STATUS, None),
+    "posture": (None, "", None),
+    "attendance": None,
+}
 
 
 class VideoProcessor:
@@ -28,69 +91,321 @@ class VideoProcessor:
     logging.
     """
 
-    def __init__(self):
+    def __init__(self, engine=None, schedule=None, emotion_batcher=None, attendance_tracking=False, registry=None,
+                 log_sink=None, log_transitions=False, detection_scale=1, detection_roi=False, proctoring=False,
+                 yolo_batcher=None, render=False, motion_gate=None, attendance_index=None,
+                 load_shedder=None):
         """
-        Initializes the VideoProcessor class by loading the required models and classifiers.
+        Initializes the VideoProcessor class with the required models and classifiers. Stateless models are shared
+        with every other processor in the process; stateful ones are drawn from the registry's pools and given back
+        by `close`.
+
+        Args:
+            - engine (AnalyzerEngine, optional): The engine that runs the analyzers in parallel. Defaults to the
+              engine shared by every processor in this process.
+            - schedule (AnalyzerSchedule, optional): The sampling cadence of each analyzer. Defaults to
+              `AnalyzerSchedule.DEFAULT_RATES`.
+            - emotion_batcher (EmotionBatcher, optional): A batcher shared with other processors so the faces of
+              concurrent sessions are classified in one forward pass. Defaults to the registry's shared batcher.
+            - attendance_tracking (bool, optional): Verify the identity once and follow the face with a tracker
+              instead of re-encoding it on every attendance check. Defaults to False.
+            - registry (ModelRegistry, optional): Where the models come from. Defaults to the process registry.
+            - log_sink (EventLogSink, optional): Where the event log is written. Defaults to the shared sink of the
+              summary log, with the bullet point log as a derived view.
+            - log_transitions (bool, optional): Log only the states that start or end (with their duration) instead
+              of the statuses of every frame. This changes the format of the summary and bullet point logs, so it is
+              opt-in. Defaults to False.
+            - detection_scale (float, optional): The resize factor of the frame for face detection; rectangles are
+              mapped back to full resolution for landmarks. dlib misses faces under about 80 px, so only lower it for
+              large frames (e.g. 0.5 for 1280x720). Defaults to 1 (the full frame).
+            - detection_roi (bool, optional): Search for faces only around the last known faces, with a periodic
+              full-frame search. Defaults to False.
+            - proctoring (bool, optional): Detect only the proctoring objects (person, laptop, cell phone, book) at
+              a reduced input size, without plotting, batched with the frames of other sessions. When False, every
+              COCO class is detected on a per-session model, as the summary and bullet point logs have always
+              reported. Defaults to False.
+            - yolo_batcher (YoloBatcher, optional): The batcher of the proctoring mode. Defaults to the registry's
+              shared batcher.
+            - render (bool, optional): Record the overlays of the analyzers so `render_frame` can draw them. With
+              rendering off (the server default) no drawing is done and no frame is copied. Defaults to False.
+            - motion_gate (MotionGate or bool, optional): Reuse the previous results for frames that barely differ
+              from the last analyzed one. True uses a `MotionGate` with its default thresholds. A blink or lip
+              movement can stay under its threshold, so short blinks and speech may be missed while it skips frames.
+              Defaults to None (every frame is analyzed).
+            - attendance_index (AttendanceIndex, optional): Identify every face against several known candidates
+              (proctoring rooms, panel interviews) instead of checking one face against `image_encoding`. The
+              identities of the last check are in `last_identities`. Defaults to None.
+            - load_shedder (LoadShedder or bool, optional): Lower the rates of the expensive analyzers, then the
+              detection scale, while the session lags behind live, and restore them when it catches up. Frame
+              timestamps must be wall-clock capture times. True uses a `LoadShedder` with its default thresholds.
+              Defaults to None (full quality on every frame).
         """
-        self.detector = dlib.get_frontal_face_detector()
+        self.engine = engine or get_default_engine()
+        self.schedule = schedule or AnalyzerSchedule()
+        self.registry = registry or get_model_registry()
+        self.log_sink = log_sink or get_log_sink(
+            SUMMARY_LOG, views=[BULLET_POINTS_LOG])
+        self.emotion_batcher = emotion_batcher or self.registry.get(
+            "emotion_batcher")
+        self.attendance_tracking = attendance_tracking
+        self.attendance_tracker = None
+        if attendance_tracking and schedule is None:
+            # The tracker has to see every frame to follow the face; it is cheap compared to the encoder
+            self.schedule.set_rate("attendance", None)
+        self.last_timings = {}
+        # Structured record of every analyzed frame of the session
+        self.timeline = EventTimeline()
+        # Debounced states of the session, turned into start/end events
+        self.log_transitions = log_transitions
+        self.temporal = TemporalEvents()
+        self.last_events = []
+        self.render = render
+        # Latest overlay of each analyzer; skipped analyzers keep their last one, like their results
+        self.overlays = {}
+        if motion_gate is True:
+            motion_gate = MotionGate()
+        self.motion_gate = motion_gate or None
+        self.last_results = None
+        self.attendance_index = attendance_index
+        self.last_identities = []
+        # Per-session instance: the dlib detector is not shared between threads of different sessions
+        self.detector = self.registry.acquire("detector")
+        # Per-session wrapper: it remembers where the faces of this session were
+        self.face_detector = ScaledFaceDetector(self.detector, scale=detection_scale, roi=detection_roi)
+        if load_shedder is True:
+            load_shedder = LoadShedder()
+        self.load_shedder = load_shedder or None
+        self.last_quality_change = None
+        if self.load_shedder is not None:
+            self.load_shedder.attach(self)
 
         self.L_start, self.L_end = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
         self.R_start, self.R_end = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
-        self.face_classifier = cv2.CascadeClassifier(
-            r'loggers/saved_models/haarcascade_frontalface_default.xml')
-        self.classifier = load_model(
-            r'loggers/saved_models/Emotion_Detection.h5')
-        self.lm_model = dlib.shape_predictor(
-            r'loggers/saved_models/shape_predictor_68_face_landmarks.dat')
+        self.classifier = self.registry.get("emotion")
+        self.lm_model = self.registry.get("landmarks")
+        import mediapipe as mp
+
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose()
         self.previous_angles = None
-        # Load the YOLOv8 model
-        self.model = YOLO(r'loggers/saved_models/yolov8n.pt')
+        # Per-session instances of the stateful models
+        self.face_classifier = self.registry.acquire("face_classifier")
+        self.pose = self.registry.acquire("pose")
+        self.proctoring = proctoring
+        if proctoring:
+            self.yolo_batcher = yolo_batcher or self.registry.get("yolo_batcher")
+            self.model = None
+        else:
+            self.yolo_batcher = None
+            self.model = self.registry.acquire("yolo")
 
-    async def video_processing(self, image_encoding, frame):
+    def close(self):
+        """
+        Gives the per-session models back to the registry pools. The processor must not be used afterwards.
         """
-        Processes a video frame by executing multiple processing tasks in parallel using ThreadPoolExecutor. Combines the results for visualization and logging.
+        for name, attribute in (("detector", "detector"), ("face_classifier", "face_classifier"), ("pose", "pose"),
+                                ("yolo", "model")):
+            model = getattr(self, attribute, None)
+            if model is not None:
+                self.registry.release(name, model)
+                setattr(self, attribute, None)
+
+    def _analyzer_call(self, name, image_encoding, frame, context, timestamp, overlay=None):
+        """
+        Builds the engine call of one analyzer. The analyzers share the read-only frame; the ones that annotate
+        record their drawing in `overlay` when rendering is on.
+        """
+        if name == "blink":
+            return AnalyzerCall(process_blink, frame, self.detector, self.lm_model,
+                                self.L_start, self.L_end, self.R_start, self.R_end, context=context)
+        if name == "gaze":
+            return AnalyzerCall(process_gaze, frame, self.detector, self.lm_model, context=context)
+        if name == "mouth":
+            return AnalyzerCall(process_mouth, frame, self.lm_model, self.detector, context=context)
+        if name == "emotion":
+            return AnalyzerCall(process_emotion, frame, self.face_classifier, self.classifier,
+                                self.detector, context=context, batcher=self.emotion_batcher, overlay=overlay)
+        if name == "headpose":
+            return AnalyzerCall(headpose_process, frame, self.detector, self.lm_model, context=context,
+                                overlay=overlay)
+        if name == "objects":
+            if self.proctoring:
+                return AnalyzerCall(detect_objects, frame, None, headless=True, batcher=self.yolo_batcher,
+                                    overlay=overlay)
+            return AnalyzerCall(detect_objects, frame, self.model, headless=True, overlay=overlay)
+        if name == "posture":
+            return AnalyzerCall(body_posture, frame, self.pose, self.mp_drawing, self.mp_pose,
+                                self.previous_angles, context=context, overlay=overlay)
+        if name == "attendance":
+            if self.attendance_index is not None:
+                return AnalyzerCall(self._identify_attendance, frame, context=context, overlay=overlay)
+            if self.attendance_tracking:
+                # An equal encoding (e.g. reloaded from the cache) keeps the tracker and the face it follows
+                if (self.attendance_tracker is None
+                        or not np.array_equal(self.attendance_tracker.known_encoding, image_encoding)):
+                    self.attendance_tracker = AttendanceTracker(image_encoding)
+                return AnalyzerCall(self.attendance_tracker.mark_attendance, frame, context=context,
+                                    timestamp=timestamp)
+            return AnalyzerCall(mark_attendance, image_encoding, frame, context=context, overlay=overlay)
+        raise ValueError(f"Unknown analyzer {name!r}")
+
+    async def _identify_attendance(self, frame, context=None, overlay=None):
+        """
+        Attendance analyzer of the multi-candidate mode: "Present" when every face is a known candidate.
+        """
+        try:
+            self.last_identities = await identify_faces(self.attendance_index, frame, context=context,
+                                                        overlay=overlay)
+        except Exception as e:
+            print("An error occurred in identify attendance function: ", e)
+            return None
+        if not self.last_identities:
+            return ATTENDANCE_NO_FACE
+        if all(candidate_id is not None for candidate_id, _, _ in self.last_identities):
+            return ATTENDANCE_PRESENT
+        return ATTENDANCE_OTHER_PERSON
+
+    async def analyze_frame(self, image_encoding, frame, timestamp=None):
+        """
+        Runs the analyzers that are due on this frame in parallel and carries forward the last result of the ones
+        the schedule skips. When the motion gate finds the frame unchanged, no analyzer runs and the results of the
+        last frame are reused.
 
         Args:
-            - frame: The video frame to be processed.
-            - full_log_toget_bullet_pts: The path to the log file for storing the extracted features to get bullet_points.
-            - full_log_toget_summary: The path to the log file for storing the combined log messages to get summary.
+            - image_encoding (numpy.ndarray): The known face encoding of the candidate.
+            - frame (numpy.ndarray): The video frame in BGR format.
+            - timestamp (float, optional): The capture time of the frame in seconds. Defaults to the current time.
 
         Returns:
-            log_message: The combined log message containing the extracted features.
+            dict: The result of every analyzer in `ANALYZERS`, by name, in the format returned by the analyzer, and
+            under "measured" the set of analyzers that ran on this frame. A disabled analyzer reports "Unknown"
+            statuses (None object counts); any other analyzer that did not run repeats its last result.
         """
-        print("PRINTING INSIDE VIDEO PROCESSING")
+        if timestamp is None:
+            timestamp = time.time()
+        # Analyzers only read the frame; a read-only view makes any stray drawing fail instead of racing
+        frame = frame.view()
+        frame.flags.writeable = False
+
+        frame_start = time.perf_counter()
+        if (self.motion_gate is not None and not self.motion_gate.should_process(frame)
+                and self.last_results is not None):
+            results = dict(self.last_results)
+            # A movement is an event of the frame it was measured on, not a state to repeat
+            annotated, movement_message, current_angles = results["posture"]
+            if movement_message.startswith("Movement detected"):
+                results["posture"] = (annotated, "", current_angles)
+            results["measured"] = frozenset()
+            self.last_timings = {"context": 0.0, "frame": time.perf_counter() - frame_start, "skipped": True}
+            self._record_frame(timestamp, results)
+            return results
+
+        # Grayscale/RGB conversions, face detection and landmarks are computed once and shared by every analyzer
+        context = FrameContext(frame, self.face_detector, self.lm_model)
+        await self.engine.run_in_thread(context.prepare)
+        context_time = time.perf_counter() - frame_start
+
+        due = [name for name in ANALYZERS if self.schedule.due(name, timestamp)]
+        overlays = {name: Overlay() for name in due} if self.render else {}
+        calls = {name: self._analyzer_call(name, image_encoding, frame, context, timestamp, overlays.get(name))
+                 for name in due}
+        results, self.last_timings = await self.engine.run(calls)
+        self.overlays.update(overlays)
+        self.last_timings["context"] = context_time
+        self.last_timings["frame"] = time.perf_counter() - frame_start
+
+        disabled = set()
+        for name in ANALYZERS:
+            if name in results:
+                self.schedule.record(name, timestamp, results[name])
+            elif self.schedule.rates.get(name) == 0:
+                disabled.add(name)
+                results[name] = DISABLED_RESULTS[name]
+            else:
+                results[name] = self.schedule.last_result(
+                    name, EMPTY_RESULTS[name])
+        # Analyzers missing from this set carried their last result forward or are disabled
+        results["measured"] = frozenset(due)
+
+        # Carried-forward per-face lists must match the faces of this frame
+        face_count = len(context.faces)
+        for name, filler in PER_FACE_FILLERS.items():
+            if name in disabled:
+                filler = UNKNOWN_STATUS
+            annotated, statuses = results[name]
+            statuses = list(statuses[:face_count])
+            statuses += [filler] * (face_count - len(statuses))
+            results[name] = (annotated, statuses)
+
+        _, _, current_angles = results["posture"]
+        if current_angles is not None:
+            self.previous_angles = current_angles
+        self.last_results = results
+        self._record_frame(timestamp, results)
+        return results
+
+    def _record_frame(self, timestamp, results):
+        """
+        Adds the frame to the timeline and the temporal state, then lets the load shedder adjust the quality of the
+        next frames. A quality change is added to the events of the frame.
+        """
+        self.timeline.append(timestamp, results,
+                             quality=self.load_shedder.level if self.load_shedder is not None else 0)
+        self.last_events = self.temporal.update(timestamp, results)
+        self.last_quality_change = None
+        if self.load_shedder is not None:
+            self.last_quality_change = self.load_shedder.observe(timestamp, time.time() - timestamp)
+            if self.last_quality_change is not None:
+                self.last_events.append(self.last_quality_change)
+
+    def render_frame(self, frame):
+        """
+        Draws the latest overlay of every analyzer on a copy of the frame, in one pass.
+
+        Args:
+            - frame (numpy.ndarray): The frame last passed to `analyze_frame`.
+
+        Returns:
+            numpy.ndarray: The annotated copy of the frame. Without `render`, an unannotated copy.
+        """
+        return compose(frame, [self.overlays.get(name) for name in ANALYZERS])
+
+    def event_message(self, results):
+        """
+        Returns the event log message of the frame last passed to `analyze_frame`: the transitions detected on it
+        when `log_transitions` is set, otherwise the statuses of the frame from `build_log_message`.
+
+        Args:
+            - results (dict): The analyzer results returned by `analyze_frame`.
+
+        Returns:
+            str: The log message, or None if there is nothing to log for this frame.
+        """
+        if self.log_transitions:
+            return ", ".join(self.last_events) or None
+        log_message = self.build_log_message(results)
+        if self.last_quality_change is not None:
+            return ", ".join(filter(None, [log_message, self.last_quality_change]))
+        return log_message
+
+    def build_log_message(self, results):
+        """
+        Combines the analyzer results of one frame into the comma-separated event log message.
 
-        last_logged_time = datetime.now()
-        print(last_logged_time)
-
-        # Assuming process_* functions are coroutine functions or wrapped to be compatible with async
-        task_1 = process_blink(frame, self.detector, self.lm_model,
-                               self.L_start, self.L_end, self.R_start, self.R_end)
-        task_2 = process_gaze(frame, self.detector, self.lm_model)
-        task_3 = process_mouth(frame, self.lm_model, self.detector)
-        task_4 = process_emotion(
-            frame, self.face_classifier, self.classifier, self.detector)
-        task_5 = headpose_process(frame, self.detector, self.lm_model)
-        task_6 = process_frame_with_yolo(frame, self.model)
-        task_7 = body_posture(
-            frame, self.pose, self.mp_drawing, self.mp_pose, self.previous_angles)
-        task_8 = asyncio.create_task(mark_attendance(
-            known_encoding=image_encoding, frame=frame
-        ))
-        results = await asyncio.gather(task_1, task_2, task_3, task_4, task_5, task_6, task_7, task_8)
-
-        _, blink_statuses = results[0]
-        _, gaze_directions = results[1]
-        _, lip_statuses = results[2]
-        _, emotion_statuses = results[3]
-        _, headpose_directions = results[4]
-        _, log_message = results[5]
-        _, movement_message, current_angles = results[6]
-        log_attendance = results[7]
-        # combined_frame = frame.copy()
+        Args:
+            - results (dict): The analyzer results returned by `analyze_frame`.
+
+        Returns:
+            str: The combined log message, or None if no face is detected in the frame.
+        """
+        _, blink_statuses = results["blink"]
+        _, gaze_directions = results["gaze"]
+        _, lip_statuses = results["mouth"]
+        _, emotion_statuses = results["emotion"]
+        _, headpose_directions = results["headpose"]
+        _, log_message, _ = results["objects"]
+        _, movement_message, current_angles = results["posture"]
+        log_attendance = results["attendance"]
         # Combine the results for visualization
         for i in range(len(blink_statuses)):
             blink_status = blink_statuses[i]
@@ -108,9 +423,6 @@ class VideoProcessor:
                 if movement_message:
                     events_to_log.append(f"Body Postures:{movement_message}")
 
-                if current_angles is not None:
-                    self.previous_angles = current_angles
-
                 # Always append detected objects into list
                 events_to_log.append(f"Object Detected : {log_message}")
 
@@ -127,16 +439,32 @@ class VideoProcessor:
                     events_to_log.append(f"Mouth Status: {lip_status}")
             else:
                 events_to_log.append(f"Attendance : {log_attendance}")
-            current_time = datetime.now()
-            print(current_time)
-            # if events_to_log and (current_time - last_logged_time).seconds >= 1:
-            log_message = ", ".join(events_to_log)
-            print(log_message)
-            if not os.path.exists(r"modules/voice_bot/log_files"):
-                os.makedirs(r"modules/voice_bot/log_files", exist_ok=True)
-            log_event(
-                log_message,  r"modules/voice_bot/log_files/full_logs_toget_summary.txt")
-            log_event(
-                log_message, r"modules/voice_bot/log_files/full_logs_toget_bullet_pts.txt")
-            last_logged_time = current_time
-            return log_message
+            return ", ".join(events_to_log)
+        return None
+
+    async def video_processing(self, image_encoding, frame, timestamp=None):
+        """
+        Processes a video frame by dispatching the analyzers that are due to the worker pools of the
+        `AnalyzerEngine`, off the event loop. Combines the results for visualization and logging.
+
+        Args:
+            - image_encoding: The known face encoding of the candidate.
+            - frame: The video frame to be processed.
+            - timestamp (float, optional): The capture time of the frame in seconds, used by the analyzer schedule.
+
+        Returns:
+            log_message: The combined log message containing the extracted features.
+        """
+        print("PRINTING INSIDE VIDEO PROCESSING")
+
+        results = await self.analyze_frame(image_encoding, frame, timestamp)
+
+        log_message = self.event_message(results)
+        if log_message is None:
+            return None
+        current_time = datetime.now()
+        print(current_time)
+        print(log_message)
+        # Buffered; written in batches by the sink, off the event loop
+        self.log_sink.emit(log_message, current_time)
+        return log_message
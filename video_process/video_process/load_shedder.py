@@ -0,0 +1,139 @@
+
+
+# Degradation steps in the order they are taken under pressure, cheapest loss of fidelity first: the most expensive
+# analyzers run less often (face encoding for attendance, YOLO, the emotion classifier), then faces are detected on
+# a smaller image. Level N applies the first N steps; every step only ever lowers the session's own setting, and the
+# detection scale never shrinks the last seen face below `min_face` pixels.
+DEFAULT_STEPS = (
+    ("rate", "attendance", 0.2),
+    ("rate", "objects", 0.5),
+    ("rate", "emotion", 1.0),
+    ("rate", "objects", 0),
+    ("rate", "emotion", 0),
+    ("scale", None, 0.35),
+    ("scale", None, 0.25),
+)
+
+
+class LoadShedder:
+    """
+    The `LoadShedder` class keeps a live session close to real time. It follows the lag of the session, the delay
+    between the capture of a frame and the end of its analysis, and when the smoothed lag stays above `high_lag` it
+    steps the quality of the session down one level; when it stays below `low_lag`, it steps back up. A level change
+    is held for at least `hold` seconds, so the controller does not oscillate between two levels.
+    """
+
+    def __init__(self, high_lag=0.5, low_lag=0.15, hold=2.0, smoothing=0.2, steps=DEFAULT_STEPS, min_face=80):
+        """
+        Args:
+            - high_lag (float, optional): The smoothed lag in seconds above which the quality is reduced.
+              Defaults to 0.5.
+            - low_lag (float, optional): The smoothed lag in seconds below which the quality is restored.
+              Defaults to 0.15.
+            - hold (float, optional): The minimum time in seconds between two level changes. Defaults to 2.0.
+            - smoothing (float, optional): The weight of the newest lag in the exponential moving average.
+              Defaults to 0.2.
+            - steps (sequence, optional): The degradation steps, as ("rate", analyzer, rate) or
+              ("scale", None, detection_scale) tuples. Defaults to `DEFAULT_STEPS`.
+            - min_face (int, optional): The smallest face height in pixels, after scaling, that a scale step may
+              leave. The dlib detector misses faces under about 80 px. While no face is known, the detection scale
+              is not lowered. Defaults to 80.
+        """
+        self.high_lag = high_lag
+        self.low_lag = low_lag
+        self.hold = hold
+        self.smoothing = smoothing
+        self.steps = tuple(steps)
+        self.min_face = min_face
+        self.level = 0
+        self.lag = None
+        self.changes = 0
+        self._last_change = None
+        self._processor = None
+        self._rates = {}
+        self._scale = None
+
+    def attach(self, processor):
+        """
+        Binds the shedder to a processor and remembers its full-quality settings.
+        """
+        self._processor = processor
+        self._rates = {name: processor.schedule.rates.get(name)
+                       for kind, name, _ in self.steps if kind == "rate"}
+        self._scale = processor.face_detector.scale
+
+    @property
+    def max_level(self):
+        """int: The lowest quality level."""
+        return len(self.steps)
+
+    def settings(self, level):
+        """
+        Returns the analyzer rates and the detection scale of a quality level.
+        """
+        rates = dict(self._rates)
+        scale = self._scale
+        for kind, name, value in self.steps[:level]:
+            if kind == "rate":
+                # None runs the analyzer on every frame, so any rate is lower; 0 (disabled) stays disabled
+                current = rates[name]
+                rates[name] = value if current is None else min(current, value)
+            else:
+                scale = min(scale, value)
+        return rates, scale
+
+    def _scale_floor(self):
+        """
+        Returns the lowest detection scale that keeps the smallest last seen face at `min_face` pixels.
+        """
+        faces = self._processor.face_detector.last_faces
+        if not faces:
+            return self._scale
+        smallest = min(face.bottom() - face.top() for face in faces)
+        return min(self.min_face / max(smallest, 1), self._scale)
+
+    def _apply(self, level):
+        rates, scale = self.settings(level)
+        for name, rate in rates.items():
+            self._processor.schedule.set_rate(name, rate)
+        self._processor.face_detector.scale = max(scale, self._scale_floor())
+        self.level = level
+
+    def describe(self, level=None):
+        """
+        Returns a short description of the settings of a quality level (the current one by default).
+        """
+        rates, scale = self.settings(self.level if level is None else level)
+        if level is None:
+            # The scale actually applied, after the face size floor
+            scale = self._processor.face_detector.scale
+        parts = [f"{name} {'off' if rate == 0 else 'every frame' if rate is None else f'{rate:g} Hz'}"
+                 for name, rate in rates.items()]
+        parts.append(f"detection scale {scale:g}")
+        return ", ".join(parts)
+
+    def observe(self, timestamp, lag):
+        """
+        Updates the smoothed lag with the lag of one frame and changes the quality level if needed.
+
+        Args:
+            - timestamp (float): The capture time of the frame in seconds.
+            - lag (float): The delay in seconds between the capture of the frame and the end of its analysis.
+
+        Returns:
+            str: An event describing the quality change, or None if the level did not change.
+        """
+        self.lag = lag if self.lag is None else self.smoothing * lag + (1 - self.smoothing) * self.lag
+        if self._last_change is not None and timestamp - self._last_change < self.hold:
+            return None
+
+        if self.lag > self.high_lag and self.level < self.max_level:
+            level, verb = self.level + 1, "reduced"
+        elif self.lag < self.low_lag and self.level > 0:
+            level, verb = self.level - 1, "restored"
+        else:
+            return None
+        self._apply(level)
+        self._last_change = timestamp
+        self.changes += 1
+        return f"Quality {verb} to level {level} (lag {self.lag:.2f} s): {self.describe()}"
@@ -0,0 +1,160 @@
+
+
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from collections import deque
+from datetime import datetime
+
+
+class EventLogSink:
+    """
+    The `EventLogSink` class buffers event log lines in memory and appends them to the log file in batches, off the
+    event loop, instead of opening and writing the file for every frame.
+
+    Each batch of events is formatted once and appended to the log and to every view (e.g. the bullet point log
+    next to the summary log), each a separate file. The buffer is a ring: if the disk cannot keep up, the oldest
+    unwritten events are dropped, counted in `dropped`, and the next flush writes a line saying how many were lost.
+    """
+
+    def __init__(self, path, views=(), max_buffer=4096, flush_size=64, flush_interval=1.0):
+        """
+        Args:
+            - path (str): The log file events are appended to.
+            - views (sequence, optional): Other paths the same events are appended to.
+            - max_buffer (int, optional): The maximum number of unwritten events kept in memory. Defaults to 4096.
+            - flush_size (int, optional): Flush as soon as this many events are buffered. Defaults to 64.
+            - flush_interval (float, optional): Flush at least this often, in seconds. Defaults to 1.
+        """
+        self.path = path
+        self.views = list(views)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._reported_drops = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._write_lock = threading.Lock()
+        self._wakeup = None
+        self._task = None
+        self._closed = False
+        _sinks.add(self)
+
+    def emit(self, message, timestamp=None):
+        """
+        Queues one event. Never blocks on disk I/O.
+
+        Args:
+            - message (str): The event log message.
+            - timestamp (datetime, optional): When the event happened. Defaults to now.
+        """
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        timestamp = timestamp or datetime.now()
+        self._buffer.append(
+            f"{timestamp:%Y-%m-%d %H:%M:%S} - {message}\n")
+
+        if (self._task is None or self._task.done()) and not self._closed:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                self._wakeup = asyncio.Event()
+                self._task = loop.create_task(self._run())
+        if len(self._buffer) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _paths(self):
+        """
+        Returns the log and the views to append to, creating their directories. A path that is the same file as one
+        before it (a hard link) is skipped so its lines are not written twice.
+        """
+        paths = []
+        for path in [self.path] + self.views:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and any(os.path.exists(other) and os.path.samefile(path, other)
+                                            for other in paths):
+                continue
+            paths.append(path)
+        return paths
+
+    def flush_sync(self):
+        """
+        Writes every buffered event to disk, blocking the caller.
+        """
+        with self._write_lock:
+            lines = []
+            while self._buffer:
+                lines.append(self._buffer.popleft())
+            dropped = self.dropped - self._reported_drops
+            if dropped:
+                self._reported_drops = self.dropped
+                print(f"Event log {self.path}: {dropped} events dropped, the buffer was full")
+                lines.insert(0, f"{datetime.now():%Y-%m-%d %H:%M:%S} - {dropped} events dropped (log buffer full)\n")
+            if not lines:
+                return
+            batch = "".join(lines)
+            for path in self._paths():
+                with open(path, "a") as file:
+                    file.write(batch)
+
+    async def flush(self):
+        """
+        Writes every buffered event to disk on a worker thread.
+        """
+        if self._buffer or self.dropped != self._reported_drops:
+            await asyncio.to_thread(self.flush_sync)
+
+    async def close(self):
+        """
+        Stops the background flusher and writes the remaining events.
+        """
+        self._closed = True
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        await self.flush()
+
+
+_sinks = weakref.WeakSet()
+_shared_sinks = {}
+
+
+def get_log_sink(path, views=()):
+    """
+    Returns the sink of this process that writes to `path`, creating it on first use, so every session appending
+    to the same log shares one buffer.
+    """
+    sink = _shared_sinks.get(path)
+    if sink is None:
+        sink = _shared_sinks[path] = EventLogSink(path, views=views)
+    return sink
+
+
+async def close_log_sinks():
+    """
+    Flushes and closes every sink, e.g. from the application shutdown handler.
+    """
+    for sink in list(_sinks):
+        await sink.close()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Last resort for processes that exit without awaiting close_log_sinks()
+    for sink in list(_sinks):
+        sink.flush_sync()
@@ -0,0 +1,218 @@
+
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+from modules.voice_bot.video_process.inference_backend import OnnxClassifier, get_inference_backend, onnx_path
+from modules.voice_bot.video_process.thread_budget import configure_imported_libraries, get_thread_budget
+
+
+MODEL_PATHS = {
+    "landmarks": r'loggers/saved_models/shape_predictor_68_face_landmarks.dat',
+    "face_classifier": r'loggers/saved_models/haarcascade_frontalface_default.xml',
+    "emotion": r'loggers/saved_models/Emotion_Detection.h5',
+    "yolo": r'loggers/saved_models/yolov8n.pt',
+}
+
+# Models shared by every session
+SHARED_MODELS = ("landmarks", "emotion", "emotion_batcher", "yolo_batcher")
+
+# Models that keep per-call state or are not documented as safe to call from several threads at once (the dlib face
+# detector). Each session takes its own instance from a pool and gives it back when it ends.
+POOLED_MODELS = ("detector", "face_classifier", "pose", "yolo")
+
+_WARMUP_FRAME = np.zeros((240, 320, 3), dtype=np.uint8)
+
+
+# The heavy libraries (dlib, TensorFlow/Keras, MediaPipe, ultralytics/PyTorch) are imported by the loaders, so
+# importing the package costs nothing until a model is actually needed. With an ONNX backend the emotion classifier
+# and YOLO run on ONNX Runtime from the files written by tools/export_models.py, and TensorFlow is never loaded.
+
+
+def _load_detector():
+    import dlib
+
+    detector = dlib.get_frontal_face_detector()
+    detector(cv2.cvtColor(_WARMUP_FRAME, cv2.COLOR_BGR2GRAY))
+    return detector
+
+
+def _load_landmarks():
+    import dlib
+
+    lm_model = dlib.shape_predictor(MODEL_PATHS["landmarks"])
+    lm_model(cv2.cvtColor(_WARMUP_FRAME, cv2.COLOR_BGR2GRAY),
+             dlib.rectangle(80, 40, 240, 200))
+    return lm_model
+
+
+def _load_emotion(backend="keras"):
+    if backend == "keras":
+        from keras.models import load_model
+
+        configure_imported_libraries(get_thread_budget().library_threads)
+        classifier = load_model(MODEL_PATHS["emotion"])
+    else:
+        classifier = OnnxClassifier(onnx_path(MODEL_PATHS["emotion"], backend),
+                                    threads=get_thread_budget().library_threads)
+    # The first call builds and traces the graph, which is much slower than any later call
+    classifier.predict_on_batch(np.zeros((1, 224, 224, 3), dtype=np.float32))
+    return classifier
+
+
+def _load_face_classifier():
+    face_classifier = cv2.CascadeClassifier(MODEL_PATHS["face_classifier"])
+    face_classifier.detectMultiScale(
+        cv2.cvtColor(_WARMUP_FRAME, cv2.COLOR_BGR2GRAY))
+    return face_classifier
+
+
+def _load_pose():
+    import mediapipe as mp
+
+    pose = mp.solutions.pose.Pose()
+    pose.process(cv2.cvtColor(_WARMUP_FRAME, cv2.COLOR_BGR2RGB))
+    return pose
+
+
+def _load_yolo(backend="keras"):
+    from ultralytics import YOLO
+
+    # PyTorch sizes its pool to the whole machine unless told otherwise
+    configure_imported_libraries(get_thread_budget().library_threads)
+    # ultralytics runs an exported .onnx file on ONNX Runtime itself
+    path = MODEL_PATHS["yolo"] if backend == "keras" else onnx_path(MODEL_PATHS["yolo"], backend)
+    model = YOLO(path, task="detect")
+    model.predict(_WARMUP_FRAME, verbose=False)
+    return model
+
+
+def _load_yolo_batcher(backend="keras"):
+    from modules.voice_bot.video_process.detect_object import PROCTORING_CLASSES, PROCTORING_IMGSZ, YoloBatcher
+
+    # The batcher owns its model: predict calls are serialized on its worker thread
+    model = _load_yolo(backend)
+    model.predict(_WARMUP_FRAME, classes=list(PROCTORING_CLASSES), imgsz=PROCTORING_IMGSZ, verbose=False)
+    return YoloBatcher(model)
+
+
+class ModelRegistry:
+    """
+    The `ModelRegistry` class loads every model of the video pipeline lazily, once per process, runs a warm-up
+    inference so the first real frame is not slow, and shares the models across all sessions. Models listed in
+    `POOLED_MODELS` hold state, so sessions draw their own instance from a pool with `acquire` and return it with
+    `release`; instances are reused by later sessions instead of being loaded again.
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            - backend (str, optional): The runtime of the emotion classifier and YOLO, one of `BACKENDS`. Defaults
+              to the VIDEO_INFERENCE_BACKEND environment variable, or "keras".
+        """
+        self.backend = backend or get_inference_backend()
+        self._models = {}
+        self._pools = defaultdict(list)
+        self._lock = threading.Lock()
+        self._load_locks = defaultdict(threading.Lock)
+        self._loaders = {
+            "detector": _load_detector,
+            "landmarks": _load_landmarks,
+            "emotion": lambda: _load_emotion(self.backend),
+            "emotion_batcher": self._load_emotion_batcher,
+            "face_classifier": _load_face_classifier,
+            "pose": _load_pose,
+            "yolo": lambda: _load_yolo(self.backend),
+            "yolo_batcher": lambda: _load_yolo_batcher(self.backend),
+        }
+
+    def _load_emotion_batcher(self):
+        from modules.voice_bot.video_process.emotion import EmotionBatcher
+        return EmotionBatcher(self.get("emotion"))
+
+    def get(self, name):
+        """
+        Returns a shared model, loading and warming it up on first use.
+
+        Args:
+            - name (str): One of `SHARED_MODELS`.
+
+        Returns:
+            The loaded model.
+        """
+        if name not in SHARED_MODELS:
+            raise ValueError(
+                f"{name!r} is not a shared model. Use acquire() for {POOLED_MODELS}")
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._load_locks[name]
+        # A per-model lock lets different models load concurrently while each one is only loaded once
+        with load_lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._loaders[name]()
+                self._models[name] = model
+        return model
+
+    def acquire(self, name):
+        """
+        Takes a per-session instance of a stateful model from its pool, loading a new one if the pool is empty.
+
+        Args:
+            - name (str): One of `POOLED_MODELS`.
+
+        Returns:
+            The model instance, to be given back with `release`.
+        """
+        if name not in POOLED_MODELS:
+            raise ValueError(
+                f"{name!r} is not a pooled model. Use get() for {SHARED_MODELS}")
+        with self._lock:
+            if self._pools[name]:
+                return self._pools[name].pop()
+        return self._loaders[name]()
+
+    def release(self, name, model):
+        """
+        Returns a per-session model instance to its pool.
+        """
+        with self._lock:
+            self._pools[name].append(model)
+
+    @contextmanager
+    def session(self, name):
+        """
+        Context manager that acquires a pooled model and releases it on exit.
+        """
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name, model)
+
+    def preload(self, names=SHARED_MODELS):
+        """
+        Loads and warms up the given shared models ahead of the first session.
+        """
+        for name in names:
+            self.get(name)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """
+    Returns the model registry of this process, creating it on first use.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+    return _registry
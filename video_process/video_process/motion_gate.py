@@ -0,0 +1,85 @@
+
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    The `MotionGate` class decides whether a frame differs enough from the last analyzed frame to be worth a full
+    analysis. Both frames are reduced to a tiny grayscale thumbnail (a few thousand pixels, well under a millisecond)
+    and compared pixel by pixel; when too few pixels changed, the previous results are reused.
+
+    The frame is compared with the last analyzed frame rather than the previous one, so slow drift accumulates
+    until it is analyzed, and `max_skip` bounds how many frames in a row can be skipped so short events that barely
+    change the thumbnail (a blink) are still sampled.
+    """
+
+    def __init__(self, size=(64, 48), pixel_threshold=12, changed_fraction=0.002, max_skip=5):
+        """
+        Args:
+            - size (tuple, optional): The (width, height) of the thumbnail. Defaults to (64, 48).
+            - pixel_threshold (int, optional): The gray level difference above which a thumbnail pixel counts as
+              changed. Defaults to 12.
+            - changed_fraction (float, optional): The share of changed pixels above which the frame is analyzed.
+              Defaults to 0.002 (6 pixels of a 64x48 thumbnail).
+            - max_skip (int, optional): The maximum number of consecutive frames skipped. Defaults to 5.
+        """
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.max_skip = max_skip
+        self.processed = 0
+        self.skipped = 0
+        self._reference = None
+        self._streak = 0
+
+    def reset(self):
+        """
+        Forces the next frame to be analyzed.
+        """
+        self._reference = None
+        self._streak = 0
+
+    def thumbnail(self, frame):
+        """
+        Returns the tiny grayscale version of a BGR (or grayscale) frame.
+        """
+        # Resizing first makes the color conversion nearly free
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_process(self, frame):
+        """
+        Checks whether a frame must be analyzed, and counts it as processed or skipped.
+
+        Args:
+            - frame (numpy.ndarray): The video frame.
+
+        Returns:
+            bool: True if the frame changed (or too many frames were skipped), False to reuse the last results.
+        """
+        thumbnail = self.thumbnail(frame)
+        if self._reference is not None and self._reference.shape == thumbnail.shape and self._streak < self.max_skip:
+            changed = np.count_nonzero(cv2.absdiff(thumbnail, self._reference) > self.pixel_threshold)
+            if changed <= self.changed_fraction * thumbnail.size:
+                self._streak += 1
+                self.skipped += 1
+                return False
+        self._reference = thumbnail
+        self._streak = 0
+        self.processed += 1
+        return True
+
+    def stats(self):
+        """
+        Returns the processed and skipped frame counts and the skipped share.
+        """
+        total = self.processed + self.skipped
+        return {
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "skipped_fraction": self.skipped / total if total else 0.0,
+        }
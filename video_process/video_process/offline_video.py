@@ -0,0 +1,186 @@
+
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import cv2
+from modules.voice_bot.video_process.detect_face import known_image_encoding
+from modules.voice_bot.video_process.interview_video import VideoProcessor
+
+
+class FrameReader(threading.Thread):
+    """
+    The `FrameReader` class decodes a video file on a dedicated thread into a bounded queue, so decoding overlaps
+    with analysis and memory stays bounded when the analyzers are slower than the decoder.
+    """
+
+    _END = object()
+
+    def __init__(self, video_path, queue_size=64, start_frame=0, end_frame=None):
+        """
+        Args:
+            - video_path (str): The path of the recorded video file.
+            - queue_size (int, optional): The maximum number of decoded frames waiting to be analyzed. Defaults to 64.
+            - start_frame (int, optional): The index of the first frame to read. Defaults to 0.
+            - end_frame (int, optional): The index one past the last frame to read. Defaults to the end of the file.
+        """
+        super().__init__(name="video-frame-reader", daemon=True)
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.fps = None
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def _put(self, item):
+        # Block while the queue is full, but give up if the consumer stopped reading
+        while not self._stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            if not cap.isOpened():
+                raise IOError(f"Could not open video file {self.video_path}")
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            if self.start_frame:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+
+            index = self.start_frame
+            while self.end_frame is None or index < self.end_frame:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                # Frame index based timestamps stay exact across seeks, unlike CAP_PROP_POS_MSEC
+                if not self._put((index, index / self.fps, frame)):
+                    break
+                index += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self._put(self._END)
+
+    def stop(self):
+        """
+        Stops decoding, e.g. when the consumer gives up early.
+        """
+        self._stop_event.set()
+
+    def __iter__(self):
+        """
+        Yields (frame_index, timestamp_seconds, frame) tuples until the end of the file.
+
+        Raises:
+            Exception: The error that stopped the reader, if any.
+        """
+        while True:
+            item = self.frames.get()
+            if item is self._END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+async def process_video_file(video_path, known_image=None, image_encoding=None, timeline_path=None,
+                             processor=None, queue_size=64, start_frame=0, end_frame=None, columnar_path=None):
+    """
+    Analyzes a recorded interview video file without a camera, window or keyboard.
+
+    Frames are decoded on a dedicated reader thread and analyzed with the same analyzers as a live session. Each
+    frame's combined log message is written to the event timeline with its offset in the video.
+
+    Args:
+        - video_path (str): The path of the recorded video file.
+        - known_image (str, optional): The reference image of the candidate. Ignored if `image_encoding` is given.
+        - image_encoding (numpy.ndarray, optional): The known face encoding of the candidate.
+        - timeline_path (str, optional): The file the event timeline is written to. Nothing is written if omitted.
+        - processor (VideoProcessor, optional): The processor to use. A new one is created if omitted.
+        - queue_size (int, optional): The size of the decoded frame queue. Defaults to 64.
+        - start_frame (int, optional): The index of the first frame to analyze. Defaults to 0.
+        - end_frame (int, optional): The index one past the last frame to analyze. Defaults to the end of the file.
+        - columnar_path (str, optional): The file the structured `EventTimeline` is saved to.
+
+    Returns:
+        dict: A dictionary with the keys:
+            - timeline (list): (timestamp_seconds, log_message) tuples in frame order.
+            - events (EventTimeline): The structured timeline of the analyzed frames.
+            - frames (int): The number of analyzed frames.
+            - skipped (int): The frames whose results were reused because the motion gate found them unchanged.
+            - seconds (float): The wall time of the analysis.
+            - fps (float): The analysis throughput in frames per second.
+    """
+    if image_encoding is None and known_image is not None:
+        image_encoding = await known_image_encoding(known_image)
+    own_processor = processor is None
+    processor = processor or VideoProcessor()
+
+    reader = FrameReader(video_path, queue_size=queue_size,
+                         start_frame=start_frame, end_frame=end_frame)
+    reader.start()
+    frames = iter(reader)
+    loop = asyncio.get_running_loop()
+
+    timeline_file = None
+    if timeline_path:
+        directory = os.path.dirname(timeline_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        timeline_file = open(timeline_path, "w")
+
+    timeline = []
+    frame_count = 0
+    first_row = len(processor.timeline)
+    start = time.perf_counter()
+    try:
+        while True:
+            # Waiting on the reader queue must not block the event loop, nor hold an analyzer thread of the engine
+            item = await loop.run_in_executor(None, next, frames, None)
+            if item is None:
+                break
+            _, timestamp, frame = item
+            results = await processor.analyze_frame(image_encoding, frame, timestamp)
+            frame_count += 1
+            log_message = processor.event_message(results)
+            if log_message is None:
+                continue
+            timeline.append((timestamp, log_message))
+            if timeline_file is not None:
+                timeline_file.write(f"{timestamp:.3f} - {log_message}\n")
+    finally:
+        reader.stop()
+        if timeline_file is not None:
+            timeline_file.close()
+        if own_processor:
+            processor.close()
+
+    seconds = time.perf_counter() - start
+    events = processor.timeline.since(first_row)
+    if columnar_path:
+        events.save(columnar_path)
+    fps = frame_count / seconds if seconds > 0 else 0.0
+    print(f"Analyzed {frame_count} frames of {video_path} in {seconds:.1f} s ({fps:.1f} fps)")
+    return {
+        "timeline": timeline,
+        "events": events,
+        "frames": frame_count,
+        "skipped": processor.motion_gate.skipped if processor.motion_gate is not None else 0,
+        "seconds": seconds,
+        "fps": fps,
+    }
+
+
+# video_path = r"recordings\interview.mp4"
+# known_image = r"images\front_side1.png"
+# asyncio.run(process_video_file(video_path, known_image=known_image,
+#             timeline_path=r"log_files\interview_timeline.txt"))
@@ -0,0 +1,61 @@
+
+
+import cv2
+
+
+class Overlay:
+    """
+    The `Overlay` class records the drawing an analyzer wants on the frame instead of drawing it. Analyzers never
+    draw on the frame they analyze; when rendering is on they get an overlay, and `compose` draws every overlay of
+    the frame once, on a single copy. With rendering off no overlay is passed and no drawing work is done at all.
+
+    Each primitive is a drawing function called later as `function(image, *args, **kwargs)`, such as
+    `cv2.rectangle` or `mp_drawing.draw_landmarks`.
+    """
+
+    def __init__(self):
+        self.primitives = []
+
+    def __len__(self):
+        return len(self.primitives)
+
+    def add(self, function, *args, **kwargs):
+        """
+        Records a call of a drawing function that takes the image as its first argument.
+        """
+        self.primitives.append((function, args, kwargs))
+
+    def rectangle(self, pt1, pt2, color, thickness=2):
+        self.add(cv2.rectangle, pt1, pt2, color, thickness)
+
+    def circle(self, center, radius, color, thickness=-1):
+        self.add(cv2.circle, center, radius, color, thickness)
+
+    def text(self, text, org, scale, color, thickness=2):
+        self.add(cv2.putText, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
+
+    def draw(self, image):
+        """
+        Draws the recorded primitives on `image` in place.
+        """
+        for function, args, kwargs in self.primitives:
+            function(image, *args, **kwargs)
+        return image
+
+
+def compose(frame, overlays):
+    """
+    Draws the overlays of one frame on a single copy of it.
+
+    Args:
+        - frame (numpy.ndarray): The analyzed frame. It is not modified.
+        - overlays (iterable): The `Overlay` objects of the analyzers, drawn in order. `None` entries are skipped.
+
+    Returns:
+        numpy.ndarray: The annotated copy of the frame.
+    """
+    image = frame.copy()
+    for overlay in overlays:
+        if overlay is not None:
+            overlay.draw(image)
+    return image
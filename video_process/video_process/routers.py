@@ -0,0 +1,142 @@
+import asyncio
+import traceback
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from loguru import logger
+from modules.voice_bot.video_process.detect_face import known_image_encoding, session_reference_image
+from modules.voice_bot.video_process.frame_stream import FrameStream
+from modules.voice_bot.video_process.interview_video import VideoProcessor, session_timeline_path
+from modules.voice_bot.video_process.session_scheduler import get_session_scheduler
+from modules.voice_bot.video_process.thread_budget import get_thread_budget, set_thread_budget
+
+
+router = APIRouter()
+
+
+@router.on_event("startup")
+async def apply_thread_budget():
+    """
+    Applies the thread budget of the process (VIDEO_SESSIONS concurrent sessions) before the first session loads a
+    model.
+    """
+    budget = set_thread_budget(get_thread_budget())
+    logger.info(f"Video thread budget: {budget.analyzer_workers} analyzer threads, "
+                f"{budget.library_threads} library threads per session")
+
+
+@router.websocket("/video_stream")
+async def video_stream_endpoint(
+    websocket: WebSocket,
+    session_id: int,
+    queue_size: int = 2,
+    reduced_decode: bool = False,
+    result_interval: float = None,
+    scheduled: bool = False,
+    load_shedding: bool = True,
+):
+    """
+    # VIDEO STREAMING ROUTE
+
+    - Streams the camera of an interview session to the video analysis pipeline over a WebSocket.
+    - Each binary message is one JPEG frame. A text message `end` finishes the stream.
+    - The reference face of the candidate is the server-side image of the session (see `session_reference_image`). The
+      socket is closed with code 1008 if the session has none or no face is found in it.
+    - Frames are decoded at half resolution if `reduced_decode` is true (only for frames well above 640x480).
+    - At most `queue_size` frames wait for analysis; older frames are dropped, so under load fewer frames are analyzed
+      instead of the results falling behind the live interview.
+    - After every analyzed frame (or every `result_interval` seconds) a JSON report is sent back with the transition
+      events, the statuses (or the session counters), the lag behind live and the received/dropped/analyzed counts.
+    - With `scheduled`, the frames are analyzed by the process-wide session scheduler, in turn with the frames of the
+      other scheduled sessions and batched with them in the model calls; the stats then include the lag of the
+      session.
+    - With `load_shedding` (the default), a session that falls behind live first runs the attendance, object and
+      emotion checks less often, then detects faces on a smaller image, and gets its full quality back once it
+      catches up. Every change is logged as an event and the current level is in the stats as `quality`.
+    - When the stream ends, the structured event timeline of the session is saved in the binary columnar format of
+      `EventTimeline` (see `session_timeline_path`).
+
+    # Sample Connection
+
+    ```
+    ws://<host>/video_stream?session_id=1&result_interval=5
+    ```
+
+    # Sample Report
+
+    ```json
+    {
+        "timestamp": 1718000000.12,
+        "events": ["Gaze Direction: Left"],
+        "lag": 0.08,
+        "stats": {"received": 120, "dropped": 14, "analyzed": 106, "invalid": 0},
+        "statuses": {"attendance": "Present", "faces": 1, "blink": "Not Blinking", "gaze": "Left", "mouth": "Closed",
+                     "emotion": "Neutral", "headpose": "Center", "objects": {"person": 1}, "posture": "",
+                     "measured": ["blink", "gaze", "headpose", "mouth", "posture"]}
+    }
+    ```
+    """
+    await websocket.accept()
+    processor = None
+    stream = None
+    receiver = None
+    try:
+        known_image = session_reference_image(session_id)
+        image_encoding = await known_image_encoding(known_image) if known_image is not None else None
+        if image_encoding is None:
+            logger.error(f"No reference face for video stream of session {session_id}")
+            await websocket.send_json({"error": "No reference face found for this session"})
+            await websocket.close(code=1008)
+            return
+        # The reports carry transition events, not the statuses of every frame
+        processor = VideoProcessor(log_transitions=True, load_shedder=load_shedding)
+        options = dict(queue_size=queue_size, reduced_decode=reduced_decode, result_interval=result_interval)
+        if scheduled:
+            stream = get_session_scheduler().open(session_id, image_encoding, processor=processor, **options)
+        else:
+            stream = FrameStream(processor, image_encoding, **options)
+
+        async def receive_frames():
+            # Returns True if the client went away, False if it ended the stream
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return True
+                    if message.get("bytes"):
+                        stream.push(message["bytes"])
+                    elif message.get("text") == "end":
+                        return False
+            finally:
+                stream.close()
+
+        receiver = asyncio.create_task(receive_frames())
+        async for report in stream.results():
+            if receiver.done() and receiver.result():
+                continue
+            await websocket.send_json(report)
+        logger.debug(f"Video stream of session {session_id} ended: {stream.stats()}")
+        if not await receiver:
+            await websocket.send_json({"done": True, "stats": stream.stats()})
+            await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.debug(f"Video stream of session {session_id} disconnected")
+    except Exception:
+        logger.critical(
+            f"Error in video stream of session {session_id}: {traceback.format_exc()}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if receiver is not None:
+            receiver.cancel()
+        if stream is not None:
+            # A scheduled session may still have a frame in analysis on the scheduler
+            await stream.aclose()
+        if processor is not None:
+            if len(processor.timeline):
+                try:
+                    await asyncio.to_thread(processor.timeline.save, session_timeline_path(session_id))
+                except OSError as e:
+                    logger.error(f"Could not save the event timeline of session {session_id}: {e}")
+            processor.close()
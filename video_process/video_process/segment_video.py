@@ -0,0 +1,160 @@
+
+
+import asyncio
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+from modules.voice_bot.video_process.detect_face import known_image_encoding
+from modules.voice_bot.video_process.thread_budget import ThreadBudget, set_thread_budget
+from modules.voice_bot.video_process.timeline import EventTimeline
+
+
+def split_segments(total_frames, segment_count):
+    """
+    Splits the frames of a video into contiguous, nearly equal segments.
+
+    Args:
+        - total_frames (int): The number of frames in the video.
+        - segment_count (int): The number of segments.
+
+    Returns:
+        list: (start_frame, end_frame) tuples, with `end_frame` exclusive.
+    """
+    segment_count = max(1, min(segment_count, total_frames))
+    bounds = [total_frames * i // segment_count for i in range(segment_count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(segment_count)]
+
+
+def _init_worker(budget, counter):
+    """
+    Applies the thread budget in a new worker process, before any model is loaded. Each worker takes the next
+    share of the cores.
+    """
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    set_thread_budget(budget, session_index=index)
+
+
+def _process_segment(video_path, image_encoding, start_frame, end_frame, warmup_frames, fps, threads):
+    """
+    Analyzes one segment inside a worker process with its own `VideoProcessor` and models, on an engine of `threads`
+    analyzer threads (the worker's share of the cores).
+
+    The `warmup_frames` frames before the segment are analyzed first so that cross-frame state, such as the
+    `previous_angles` used by `body_posture`, matches what a sequential run would have at the boundary. Their
+    events belong to the previous segment and are dropped.
+    """
+    from modules.voice_bot.video_process.analyzer_engine import AnalyzerEngine
+    from modules.voice_bot.video_process.interview_video import VideoProcessor
+    from modules.voice_bot.video_process.offline_video import process_video_file
+
+    first_frame = max(0, start_frame - warmup_frames)
+    engine = AnalyzerEngine(max_workers=threads, process_workers=threads)
+    processor = VideoProcessor(engine=engine)
+    try:
+        report = asyncio.run(process_video_file(
+            video_path, image_encoding=image_encoding, processor=processor,
+            start_frame=first_frame, end_frame=end_frame))
+    finally:
+        processor.close()
+        engine.shutdown()
+    segment_start = start_frame / fps - 1e-6
+    timeline = [(timestamp, message) for timestamp, message in report["timeline"]
+                if timestamp >= segment_start]
+    frames = max(0, report["frames"] - (start_frame - first_frame))
+    return timeline, report["events"].between(segment_start), frames
+
+
+async def process_video_segments(video_path, known_image=None, image_encoding=None, timeline_path=None,
+                                 workers=None, segments=None, warmup_frames=2, columnar_path=None, pin=False):
+    """
+    Analyzes a long recorded video by splitting it into time segments that run in parallel worker processes, then
+    merges the per-segment event timelines back into a single ordered log.
+
+    Args:
+        - video_path (str): The path of the recorded video file.
+        - known_image (str, optional): The reference image of the candidate. Ignored if `image_encoding` is given.
+        - image_encoding (numpy.ndarray, optional): The known face encoding of the candidate.
+        - timeline_path (str, optional): The file the merged event timeline is written to.
+        - workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        - segments (int, optional): The number of segments. More segments than workers balance uneven segments
+          better. Defaults to `workers`.
+        - warmup_frames (int, optional): The frames before each segment replayed to restore cross-frame state.
+          Defaults to 2.
+        - columnar_path (str, optional): The file the merged structured `EventTimeline` is saved to.
+        - pin (bool, optional): Pin every worker process to its own share of the cores. Defaults to False.
+
+    Returns:
+        dict: A dictionary with the keys:
+            - timeline (list): (timestamp_seconds, log_message) tuples ordered by timestamp.
+            - events (EventTimeline): The merged structured timeline.
+            - frames (int): The number of analyzed frames.
+            - seconds (float): The wall time of the analysis.
+            - fps (float): The analysis throughput in frames per second.
+    """
+    if image_encoding is None and known_image is not None:
+        image_encoding = await known_image_encoding(known_image)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video file {video_path}")
+    # Only an estimate from the container; often wrong, or 0, for webm and variable frame rate files
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    if total_frames <= 0:
+        print(f"Frame count of {video_path} unknown, analyzing it in a single run")
+        from modules.voice_bot.video_process.offline_video import process_video_file
+        report = await process_video_file(video_path, image_encoding=image_encoding, timeline_path=timeline_path,
+                                          columnar_path=columnar_path)
+        return {key: report[key] for key in ("timeline", "events", "frames", "seconds", "fps")}
+
+    workers = workers or os.cpu_count()
+    # The cores are divided between the workers, so their engines and libraries do not each start a pool per core
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    budget = ThreadBudget(sessions=workers, analyzer_workers=threads, library_threads=1, pin=pin)
+    bounds = split_segments(total_frames, segments or workers)
+    # The last segment runs to the end of the file, however many frames the estimate missed
+    bounds[-1] = (bounds[-1][0], None)
+
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # TensorFlow and PyTorch are not fork-safe once initialized, so workers are spawned
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(budget, context.Value("i", 0))) as pool:
+        outcomes = await asyncio.gather(*[
+            loop.run_in_executor(pool, _process_segment, video_path, image_encoding,
+                                 start_frame, end_frame, warmup_frames, fps, threads)
+            for start_frame, end_frame in bounds])
+    timeline = list(heapq.merge(*[text for text, _, _ in outcomes], key=lambda event: event[0]))
+    events = EventTimeline.merge([structured for _, structured, _ in outcomes])
+    total_frames = sum(frames for _, _, frames in outcomes)
+    seconds = time.perf_counter() - start
+
+    if timeline_path:
+        directory = os.path.dirname(timeline_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(timeline_path, "w") as file:
+            for timestamp, log_message in timeline:
+                file.write(f"{timestamp:.3f} - {log_message}\n")
+    if columnar_path:
+        events.save(columnar_path)
+
+    fps_processed = total_frames / seconds if seconds > 0 else 0.0
+    print(f"Analyzed {total_frames} frames of {video_path} in {len(bounds)} segments "
+          f"in {seconds:.1f} s ({fps_processed:.1f} fps)")
+    return {
+        "timeline": timeline,
+        "events": events,
+        "frames": total_frames,
+        "seconds": seconds,
+        "fps": fps_processed,
+    }
@@ -0,0 +1,272 @@
+
+
+import asyncio
+import time
+
+from modules.voice_bot.video_process.frame_stream import FrameStream, decode_frame
+from modules.voice_bot.video_process.model_registry import get_model_registry
+
+
+POLICIES = ("round_robin", "deadline")
+
+
+class ScheduledSession(FrameStream):
+    """
+    The `ScheduledSession` class is the `FrameStream` of one session served by a `SessionScheduler`. Frames are
+    pushed and reports are read exactly as with a `FrameStream`, but the frames are analyzed by the scheduler, in
+    turn with the frames of the other sessions, instead of by a loop of the session's own.
+    """
+
+    def __init__(self, scheduler, session_id, processor, image_encoding, max_lag=1.0, **kwargs):
+        """
+        Args:
+            - scheduler (SessionScheduler): The scheduler serving the session.
+            - session_id: Any hashable id of the session.
+            - processor (VideoProcessor): The processor of the session.
+            - image_encoding (numpy.ndarray): The known face encoding of the candidate.
+            - max_lag (float, optional): The target delay in seconds between the capture of a frame and its
+              analysis, used as the deadline of the frame by the "deadline" policy. Defaults to 1.0.
+            - **kwargs: `queue_size`, `reduced_decode` and `result_interval`, as for `FrameStream`.
+        """
+        super().__init__(processor, image_encoding, **kwargs)
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self.max_lag = max_lag
+        # Last and worst delay between capture and the end of the analysis, in seconds
+        self.lag = None
+        self.worst_lag = 0.0
+        self.busy = False
+        # Set once the scheduler no longer uses the session's processor
+        self.retired = asyncio.Event()
+        self._analyzed = asyncio.Queue()
+
+    def push(self, data, timestamp=None):
+        super().push(data, timestamp)
+        self.scheduler.wake()
+
+    def close(self):
+        super().close()
+        self.scheduler.wake()
+
+    async def aclose(self):
+        """
+        Ends the session without analyzing the frames still waiting, and waits until the scheduler has retired it.
+        The processor of the session can only be closed afterwards: until then, a frame may still be in analysis.
+        """
+        super().close()
+        while self.queue.get_nowait() is not None:
+            pass
+        self.scheduler.wake()
+        await self.retired.wait()
+
+    @property
+    def pending(self):
+        """bool: Whether a frame is waiting and the session is not already being analyzed."""
+        return len(self.queue) > 0 and not self.busy
+
+    @property
+    def finished(self):
+        """bool: Whether the stream is closed and every frame is analyzed."""
+        return self.queue.closed and len(self.queue) == 0 and not self.busy
+
+    def deadline(self):
+        """
+        Returns the time by which the oldest waiting frame should be analyzed.
+        """
+        timestamp, _ = self.queue.peek()
+        return timestamp + self.max_lag
+
+    def stats(self):
+        stats = super().stats()
+        stats["lag"] = self.lag
+        stats["worst_lag"] = self.worst_lag
+        return stats
+
+    async def analyzed_frames(self):
+        while True:
+            item = await self._analyzed.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class SessionScheduler:
+    """
+    The `SessionScheduler` class serves the live frames of many sessions in one process. Every session keeps its own
+    `VideoProcessor` (the state of its analyzers) and a small queue of frames, while the models are loaded once in
+    the registry. In each round the scheduler takes one frame from up to `max_concurrent` sessions, chosen in turn
+    ("round_robin") or by the earliest deadline ("deadline"), and analyzes them together: the emotion ROIs (and, for
+    processors in proctoring mode, the YOLO frames) of the round reach the shared batchers at the same time and run
+    as one forward pass each.
+
+    A session that cannot keep up has frames dropped at its own queue, so a busy session never delays the others
+    by more than one round.
+    """
+
+    def __init__(self, policy="round_robin", max_concurrent=8, registry=None, batch_delay=None):
+        """
+        Args:
+            - policy (str, optional): "round_robin" to serve the sessions in turn, or "deadline" to serve first the
+              sessions whose oldest frame is closest to its `max_lag`. Defaults to "round_robin".
+            - max_concurrent (int, optional): The maximum number of frames, one per session, analyzed together.
+              Defaults to 8.
+            - registry (ModelRegistry, optional): The registry whose batchers the sessions share. Defaults to the
+              process registry.
+            - batch_delay (float, optional): If given, how long in seconds the shared batchers wait for the other
+              frames of a round before running a forward pass. It only applies to the frames of this scheduler's
+              sessions. Defaults to the batchers' own setting.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.max_concurrent = max_concurrent
+        self.registry = registry or get_model_registry()
+        self.batch_delay = batch_delay
+        self.sessions = {}
+        self.rounds = 0
+        self._order = []
+        self._next = 0
+        self._wakeup = None
+        self._task = None
+
+    def open(self, session_id, image_encoding, processor=None, max_lag=1.0, **kwargs):
+        """
+        Adds a session and starts the scheduling loop if needed. Must be called from the event loop.
+
+        Args:
+            - session_id: Any hashable id of the session, unique among the open sessions.
+            - image_encoding (numpy.ndarray): The known face encoding of the candidate.
+            - processor (VideoProcessor, optional): The processor of the session. Defaults to a new `VideoProcessor`
+              on the scheduler's registry. The caller closes it after `ScheduledSession.aclose`.
+            - max_lag (float, optional): The target lag of the session's frames. Defaults to 1.0.
+            - **kwargs: `queue_size`, `reduced_decode` and `result_interval`, as for `FrameStream`.
+
+        Returns:
+            ScheduledSession: The session, to push frames to and read reports from.
+        """
+        if session_id in self.sessions:
+            raise ValueError(f"Session {session_id!r} is already open")
+        if processor is None:
+            from modules.voice_bot.video_process.interview_video import VideoProcessor
+            processor = VideoProcessor(registry=self.registry)
+        if self.batch_delay is not None:
+            # Only the session's own calls wait for the round; the proctoring batcher is only there if already loaded
+            processor.emotion_batcher = processor.emotion_batcher.with_delay(self.batch_delay)
+            if processor.yolo_batcher is not None:
+                processor.yolo_batcher = processor.yolo_batcher.with_delay(self.batch_delay)
+        session = ScheduledSession(self, session_id, processor, image_encoding, max_lag=max_lag, **kwargs)
+        self.sessions[session_id] = session
+        self._order.append(session)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._serve())
+        self.wake()
+        return session
+
+    def wake(self):
+        """
+        Tells the scheduling loop that a session has a new frame or was closed.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def lags(self):
+        """
+        Returns the last lag in seconds of every open session, by session id (None before its first frame).
+        """
+        return {session_id: session.lag for session_id, session in self.sessions.items()}
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "rounds": self.rounds,
+            "lags": self.lags(),
+        }
+
+    def _select(self):
+        """
+        Returns the sessions whose next frame is analyzed in this round.
+        """
+        if self.policy == "deadline":
+            ready = [session for session in self._order if session.pending]
+            ready.sort(key=ScheduledSession.deadline)
+            return ready[:self.max_concurrent]
+
+        # Round robin: start after the last session served in the previous round
+        count = len(self._order)
+        chosen = []
+        for offset in range(count):
+            session = self._order[(self._next + offset) % count]
+            if session.pending:
+                chosen.append(session)
+                if len(chosen) == self.max_concurrent:
+                    self._next = (self._next + offset + 1) % count
+                    break
+        else:
+            self._next = 0
+        return chosen
+
+    def _retire(self):
+        """
+        Removes the sessions that are closed and fully analyzed, and ends their report streams.
+        """
+        for session in [session for session in self._order if session.finished]:
+            self._order.remove(session)
+            del self.sessions[session.session_id]
+            session._analyzed.put_nowait(None)
+            session.retired.set()
+        self._next = self._next % len(self._order) if self._order else 0
+
+    async def _analyze(self, session):
+        """
+        Decodes and analyzes the oldest frame of a session and hands the results to its report stream.
+        """
+        timestamp, data = session.queue.get_nowait()
+        try:
+            frame = await session.processor.engine.run_in_thread(decode_frame, data, session.reduced_decode)
+            if frame is None:
+                session.invalid += 1
+                return
+            results = await session.processor.analyze_frame(session.image_encoding, frame, timestamp)
+            session.lag = time.time() - timestamp
+            session.worst_lag = max(session.worst_lag, session.lag)
+            session._analyzed.put_nowait((timestamp, results))
+        except Exception as e:
+            print(f"Error analyzing a frame of session {session.session_id}: {e}")
+            session._analyzed.put_nowait(e)
+            # The stream ends with the error: the frames still waiting are dropped
+            session.queue.close()
+            while session.queue.get_nowait() is not None:
+                pass
+        finally:
+            session.busy = False
+
+    async def _serve(self):
+        while self._order:
+            self._retire()
+            chosen = self._select()
+            if not chosen:
+                if not self._order:
+                    break
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            for session in chosen:
+                session.busy = True
+            await asyncio.gather(*[self._analyze(session) for session in chosen])
+            self.rounds += 1
+
+
+_scheduler = None
+
+
+def get_session_scheduler():
+    """
+    Returns the scheduler shared by every live session of this process, creating it on first use.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = SessionScheduler()
+    return _scheduler
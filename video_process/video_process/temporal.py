@@ -0,0 +1,210 @@
+
+
+from collections import defaultdict, deque
+
+
+class StateTracker:
+    """
+    The `StateTracker` class debounces the per-frame status of one analyzer into states with a start and an end.
+
+    A new status only becomes the current state once it has been observed continuously for `hold` seconds and at
+    least `min_frames` frames (hysteresis), so a single noisy frame does not produce an event. The transition is
+    dated back to the first frame of the new status. Only transitions are reported; frames that do not change the
+    state produce nothing.
+    """
+
+    def __init__(self, label, baseline=None, hold=0.0, min_frames=1, window=60.0):
+        """
+        Args:
+            - label (str): The name used in event messages, e.g. "Gaze Direction".
+            - baseline (str, optional): The resting status. Entering it is reported only as the end of the previous
+              state. Defaults to None (every state is reported).
+            - hold (float, optional): The seconds a new status must persist before it is accepted. Defaults to 0.
+            - min_frames (int, optional): The frames a new status must persist before it is accepted. Defaults to 1.
+            - window (float, optional): The sliding window of `rate`, in seconds. Defaults to 60.
+        """
+        self.label = label
+        self.baseline = baseline
+        self.hold = hold
+        self.min_frames = min_frames
+        self.window = window
+        self.state = None
+        self.since = None
+        self.episodes = defaultdict(int)
+        self.durations = defaultdict(float)
+        self._recent = defaultdict(deque)
+        self._candidate = None
+        self._candidate_since = None
+        self._candidate_frames = 0
+
+    def update(self, timestamp, status):
+        """
+        Feeds the status of one frame.
+
+        Args:
+            - timestamp (float): The capture time of the frame in seconds.
+            - status (str): The analyzer status on this frame, or None if the analyzer has nothing to report.
+
+        Returns:
+            list: The event messages of the transition, empty if the state did not change.
+        """
+        if status is None or status == self.state:
+            self._candidate = None
+            return []
+        if status != self._candidate:
+            self._candidate = status
+            self._candidate_since = timestamp
+            self._candidate_frames = 0
+        self._candidate_frames += 1
+        if self._candidate_frames < self.min_frames or timestamp - self._candidate_since < self.hold:
+            return []
+
+        events = []
+        started = self._candidate_since
+        if self.state is not None:
+            duration = max(started - self.since, 0.0)
+            self.durations[self.state] += duration
+            if self.state != self.baseline:
+                events.append(f"{self.label}: {self.state} ended after {duration:.1f} s")
+        self.state = status
+        self.since = started
+        self._candidate = None
+        self.episodes[status] += 1
+        recent = self._recent[status]
+        recent.append(started)
+        while recent and recent[0] < timestamp - self.window:
+            recent.popleft()
+        if status != self.baseline:
+            events.append(f"{self.label}: {status}")
+        return events
+
+    def time_in(self, status, timestamp):
+        """
+        Returns the total seconds spent in `status`, including the current state up to `timestamp`.
+        """
+        total = self.durations[status]
+        if self.state == status and self.since is not None:
+            total += max(timestamp - self.since, 0.0)
+        return total
+
+    def rate(self, status, timestamp):
+        """
+        Returns how many times per minute `status` started during the last `window` seconds.
+        """
+        recent = self._recent[status]
+        while recent and recent[0] < timestamp - self.window:
+            recent.popleft()
+        return len(recent) * 60.0 / self.window
+
+
+def object_state(obj_counts):
+    """
+    Returns the object counts of a frame as a state, e.g. "1 book, 1 person". Classes are sorted by name, so the
+    detection order does not make the same objects a different state.
+    """
+    if obj_counts is None:
+        return "Unknown"
+    if not obj_counts:
+        return "None"
+    return ", ".join(f"{count} {name}" for name, count in sorted(obj_counts.items()))
+
+
+class TemporalEvents:
+    """
+    The `TemporalEvents` class keeps one `StateTracker` per analyzer of a session and turns the per-frame results of
+    `VideoProcessor.analyze_frame` into transition events, so a blink or a glance away is logged once with its
+    duration instead of on every frame it spans. It also exposes aggregate counters such as blinks per minute.
+    """
+
+    # label, baseline, hold (s), min_frames. A blink lasts 100-400 ms, so it is accepted on a single frame.
+    TRACKERS = {
+        "attendance": ("Attendance", "Present", 1.0, 1),
+        "blink": ("Blink Status", "Not Blinking", 0.0, 1),
+        "gaze": ("Gaze Direction", "Center", 0.3, 2),
+        "mouth": ("Mouth Status", None, 0.3, 2),
+        "emotion": ("Emotion", None, 1.0, 2),
+        "headpose": ("Head Pose", "Center", 0.5, 2),
+        "objects": ("Object Detected", None, 1.0, 1),
+    }
+
+    def __init__(self, trackers=None, window=60.0):
+        """
+        Args:
+            - trackers (dict, optional): Overrides of `TRACKERS` as analyzer name to (label, baseline, hold,
+              min_frames). Defaults to `TRACKERS`.
+            - window (float, optional): The sliding window of the rate counters, in seconds. Defaults to 60.
+        """
+        config = dict(self.TRACKERS, **(trackers or {}))
+        self.trackers = {name: StateTracker(label, baseline=baseline, hold=hold, min_frames=min_frames,
+                                            window=window)
+                         for name, (label, baseline, hold, min_frames) in config.items()}
+        self.last_timestamp = None
+
+    def update(self, timestamp, results):
+        """
+        Feeds the analyzer results of one frame.
+
+        Args:
+            - timestamp (float): The capture time of the frame in seconds.
+            - results (dict): The analyzer results returned by `VideoProcessor.analyze_frame`.
+
+        Returns:
+            list: The event messages of every state that started or ended on this frame.
+        """
+        self.last_timestamp = timestamp
+        _, blink_statuses = results["blink"]
+        _, gaze_directions = results["gaze"]
+        _, lip_statuses = results["mouth"]
+        _, emotion_statuses = results["emotion"]
+        _, headpose_direction = results["headpose"]
+        _, _, obj_counts = results["objects"]
+        _, movement_message, _ = results["posture"]
+
+        # Like the per-frame log, the face statuses are those of the first face
+        statuses = {
+            "attendance": results["attendance"],
+            "blink": blink_statuses[0] if blink_statuses else None,
+            "gaze": gaze_directions[0] if gaze_directions else None,
+            "mouth": lip_statuses[0] if lip_statuses else None,
+            "emotion": emotion_statuses[0] if emotion_statuses else None,
+            "headpose": headpose_direction if blink_statuses else None,
+            "objects": object_state(obj_counts) if results["attendance"] else None,
+        }
+        events = []
+        for name, tracker in self.trackers.items():
+            events += tracker.update(timestamp, statuses.get(name))
+        # Posture movement is already an event (a change of shoulder angle), not a state
+        if movement_message and movement_message.startswith("Movement detected"):
+            events.append(f"Body Postures:{movement_message}")
+        return events
+
+    def counters(self, timestamp=None):
+        """
+        Returns the aggregate counters of the session.
+
+        Args:
+            - timestamp (float, optional): The time the counters are computed at. Defaults to the last frame.
+
+        Returns:
+            dict: Blinks per minute over the window, total blinks, and the seconds spent gazing away, with the head
+            turned, with the mouth open and absent.
+        """
+        timestamp = self.last_timestamp if timestamp is None else timestamp
+        if timestamp is None:
+            return {}
+        blink = self.trackers["blink"]
+        gaze = self.trackers["gaze"]
+        headpose = self.trackers["headpose"]
+        attendance = self.trackers["attendance"]
+        return {
+            "blinks_per_minute": blink.rate("Blinking", timestamp),
+            "blinks": blink.episodes["Blinking"],
+            "gaze_away_seconds": sum(gaze.time_in(status, timestamp) for status in ("Left", "Right")),
+            "head_turned_seconds": sum(headpose.time_in(status, timestamp)
+                                       for status in set(headpose.durations) | {headpose.state}
+                                       if status not in (None, "Center")),
+            "mouth_open_seconds": self.trackers["mouth"].time_in("Open", timestamp),
+            "absent_seconds": sum(attendance.time_in(status, timestamp)
+                                  for status in set(attendance.durations) | {attendance.state}
+                                  if status not in (None, "Present")),
+        }
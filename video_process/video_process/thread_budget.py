@@ -0,0 +1,145 @@
+
+
+import os
+import sys
+
+
+# Environment variables read by the native thread pools when the libraries are first imported
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+)
+
+
+def available_cores():
+    """
+    Returns the CPU cores this process may run on (its affinity mask, which containers and taskset restrict).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    """
+    The `ThreadBudget` class divides the cores of the machine between the concurrent sessions and, within a session,
+    between the analyzer threads and the native thread pools of the libraries (OpenMP/BLAS, OpenCV, TensorFlow,
+    PyTorch, ONNX Runtime). Without it every library sizes its pool to the whole machine in every session, and the
+    threads of several sessions fight over the same cores.
+
+    The thread count environment variables are only read by a library when it is loaded: OpenMP and BLAS (under
+    NumPy) as the process imports NumPy, TensorFlow when it initializes. A budget therefore has to be applied
+    explicitly at application startup, before NumPy, OpenCV or any model is imported; the libraries already loaded
+    at that point only get the runtime settings (`cv2.setNumThreads`, `torch.set_num_threads`).
+    """
+
+    def __init__(self, sessions=1, cores=None, analyzer_workers=None, library_threads=None, pin=False):
+        """
+        Args:
+            - sessions (int, optional): The number of sessions (or worker processes) running at once. Defaults to 1.
+            - cores (sequence, optional): The cores to divide. Defaults to every core available to the process.
+            - analyzer_workers (int, optional): The analyzer threads of a session's engine. Defaults to the cores of
+              a session, between 2 and 8.
+            - library_threads (int, optional): The intra-op threads of each library. Defaults to the cores of a
+              session divided by the analyzer threads, at least 1.
+            - pin (bool, optional): Pin each session's process or threads to its own cores. Defaults to False.
+        """
+        self.cores = list(cores) if cores is not None else available_cores()
+        self.sessions = max(1, sessions)
+        per_session = max(1, len(self.cores) // self.sessions)
+        self.analyzer_workers = analyzer_workers or min(max(per_session, 2), 8)
+        self.library_threads = library_threads or max(1, per_session // self.analyzer_workers)
+        self.pin = pin
+
+    def session_cores(self, index):
+        """
+        Returns the cores of the session (or worker process) number `index`. Sessions beyond `sessions` wrap around.
+        """
+        per_session = max(1, len(self.cores) // self.sessions)
+        start = (index % self.sessions) * per_session % len(self.cores)
+        return self.cores[start:start + per_session]
+
+    def environment(self):
+        """
+        Returns the thread count environment variables of this budget.
+        """
+        threads = str(self.library_threads)
+        values = {name: threads for name in THREAD_ENV_VARS}
+        values["TF_NUM_INTEROP_THREADS"] = "1"
+        return values
+
+    def apply(self, session_index=None):
+        """
+        Applies the budget to this process: the environment variables (for the libraries loaded afterwards), the
+        runtime thread settings of OpenCV and of the libraries already imported, and, with `pin` and a
+        `session_index`, the CPU affinity of the process.
+        """
+        os.environ.update(self.environment())
+        import cv2
+
+        cv2.setNumThreads(self.library_threads)
+        configure_imported_libraries(self.library_threads)
+        if self.pin and session_index is not None:
+            pin_to_cores(self.session_cores(session_index))
+
+
+def configure_imported_libraries(threads):
+    """
+    Sets the intra-op threads of TensorFlow and PyTorch if they are already imported. They are never imported here.
+    """
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only allowed before the first parallel work
+            pass
+    tensorflow = sys.modules.get("tensorflow")
+    if tensorflow is not None:
+        try:
+            tensorflow.config.threading.set_intra_op_parallelism_threads(threads)
+            tensorflow.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            # Only allowed before TensorFlow is initialized; TF_NUM_INTRAOP_THREADS covers new processes
+            pass
+
+
+def pin_to_cores(cores):
+    """
+    Restricts the process to the given cores. Does nothing where CPU affinity is not supported.
+    """
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return
+    os.sched_setaffinity(0, set(cores))
+
+
+_budget = None
+
+
+def get_thread_budget():
+    """
+    Returns the thread budget of this process. Until `set_thread_budget` is called, a budget for a single session on
+    every available core, or for VIDEO_SESSIONS sessions when that environment variable is set. It only sizes the
+    engine and the model runtimes; nothing is applied to the process until `set_thread_budget`.
+    """
+    global _budget
+    if _budget is None:
+        _budget = ThreadBudget(sessions=int(os.environ.get("VIDEO_SESSIONS", "1")))
+    return _budget
+
+
+def set_thread_budget(budget, session_index=None):
+    """
+    Makes `budget` the thread budget of this process and applies it. Call it once at application startup, or in the
+    initializer of a worker process, as early as possible: the environment variables only reach the libraries loaded
+    afterwards.
+    """
+    global _budget
+    _budget = budget
+    budget.apply(session_index)
+    return budget
@@ -0,0 +1,340 @@
+
+
+import struct
+import sys
+from array import array
+from enum import IntEnum
+
+import numpy as np
+
+
+class Blink(IntEnum):
+    UNKNOWN = -2
+    NO_FACE = -1
+    NOT_BLINKING = 0
+    BLINKING = 1
+
+
+class Gaze(IntEnum):
+    UNKNOWN = -2
+    NO_FACE = -1
+    CENTER = 0
+    LEFT = 1
+    RIGHT = 2
+
+
+class Mouth(IntEnum):
+    UNKNOWN = -2
+    NO_FACE = -1
+    CLOSED = 0
+    OPEN = 1
+
+
+class Emotion(IntEnum):
+    UNKNOWN = -2
+    NO_FACE = -1
+    ANGRY = 0
+    DISGUST = 1
+    FEAR = 2
+    HAPPY = 3
+    NEUTRAL = 4
+    SAD = 5
+    SURPRISE = 6
+
+
+class HeadPose(IntEnum):
+    UNKNOWN = -1
+    CENTER = 0
+    LEFT = 1
+    RIGHT = 2
+    UP = 3
+    DOWN = 4
+    LEFT_UP = 5
+    LEFT_DOWN = 6
+    RIGHT_UP = 7
+    RIGHT_DOWN = 8
+
+
+class Attendance(IntEnum):
+    UNKNOWN = -1
+    PRESENT = 0
+    OTHER_PERSON = 1
+    NO_FACE = 2
+
+
+# Bit of each analyzer in the "measured" column, in the order of `interview_video.ANALYZERS`
+MEASURED_BITS = {name: 1 << bit for bit, name in enumerate(
+    ("blink", "gaze", "mouth", "emotion", "headpose", "objects", "posture", "attendance"))}
+ALL_MEASURED = sum(MEASURED_BITS.values())
+
+# Objects counted in their own column; every other class is added to "objects_other"
+TRACKED_OBJECTS = {
+    "person": "objects_person",
+    "cell phone": "objects_cell_phone",
+    "book": "objects_book",
+    "laptop": "objects_laptop",
+}
+
+_ATTENDANCE_CODES = {
+    "Present": Attendance.PRESENT,
+    "Absent - Another person is detected or Not looking at the center": Attendance.OTHER_PERSON,
+    "Absent - No face detected": Attendance.NO_FACE,
+}
+
+
+def _status_code(enum, status):
+    """
+    Maps an analyzer status string such as "Not Blinking" or "Left Down" to its enum member.
+    """
+    if status is None:
+        return enum.NO_FACE
+    return enum[status.strip().upper().replace(" ", "_")]
+
+
+class EventTimeline:
+    """
+    The `EventTimeline` class is a compact, structured record of a session: one row per analyzed frame with its
+    timestamp, the enum-coded statuses of the first face (as in the text log), the attendance, object counts,
+    shoulder angles and load shedding level. Rows are stored in `array.array` columns, persisted in a small binary
+    columnar format, and can be rolled up per interval without re-parsing text logs.
+    """
+
+    MAGIC = b"VTL\x01"
+
+    COLUMNS = (
+        ("timestamp", "d"),
+        ("face_count", "B"),
+        ("blink", "b"),
+        ("gaze", "b"),
+        ("mouth", "b"),
+        ("emotion", "b"),
+        ("headpose", "b"),
+        ("attendance", "b"),
+        ("objects_person", "H"),
+        ("objects_cell_phone", "H"),
+        ("objects_book", "H"),
+        ("objects_laptop", "H"),
+        ("objects_other", "H"),
+        ("movement", "B"),
+        ("left_shoulder", "f"),
+        ("right_shoulder", "f"),
+        # Load shedding level the frame was analyzed at; 0 is full quality
+        ("quality", "B"),
+        # Bits (`MEASURED_BITS`) of the analyzers that ran on the frame; the others repeat their last result, or
+        # hold UNKNOWN codes and zero object counts when disabled
+        ("measured", "B"),
+    )
+
+    # Value of a column missing from an older file
+    DEFAULTS = {"measured": ALL_MEASURED}
+
+    def __init__(self):
+        self.columns = {name: array(typecode)
+                        for name, typecode in self.COLUMNS}
+
+    def __len__(self):
+        return len(self.columns["timestamp"])
+
+    def append_record(self, **values):
+        """
+        Appends one row. Every column of `COLUMNS` must be given.
+        """
+        for name, _ in self.COLUMNS:
+            self.columns[name].append(values[name])
+
+    def append(self, timestamp, results, quality=0):
+        """
+        Appends the analyzer results of one frame.
+
+        Args:
+            - timestamp (float): The capture time of the frame in seconds.
+            - results (dict): The analyzer results returned by `VideoProcessor.analyze_frame`.
+            - quality (int, optional): The load shedding level of the frame. Defaults to 0 (full quality).
+        """
+        measured = results.get("measured")
+        measured_bits = ALL_MEASURED if measured is None else sum(MEASURED_BITS[name] for name in measured)
+        _, blink_statuses = results["blink"]
+        _, gaze_directions = results["gaze"]
+        _, lip_statuses = results["mouth"]
+        _, emotion_statuses = results["emotion"]
+        _, headpose_direction = results["headpose"]
+        _, _, obj_counts = results["objects"]
+        _, movement_message, current_angles = results["posture"]
+        attendance = results["attendance"]
+
+        def first(statuses):
+            return statuses[0] if statuses else None
+
+        objects = {column: 0 for column in TRACKED_OBJECTS.values()}
+        objects["objects_other"] = 0
+        for name, count in (obj_counts or {}).items():
+            objects[TRACKED_OBJECTS.get(name, "objects_other")] += count
+
+        left_shoulder, right_shoulder = current_angles if current_angles is not None else (np.nan, np.nan)
+        self.append_record(
+            timestamp=timestamp,
+            face_count=min(len(blink_statuses), 255),
+            blink=_status_code(Blink, first(blink_statuses)),
+            gaze=_status_code(Gaze, first(gaze_directions)),
+            mouth=_status_code(Mouth, first(lip_statuses)),
+            emotion=_status_code(Emotion, first(emotion_statuses)),
+            headpose=_status_code(HeadPose, headpose_direction or "Center"),
+            attendance=_ATTENDANCE_CODES.get(attendance, Attendance.UNKNOWN),
+            movement=int(bool(movement_message) and movement_message.startswith("Movement detected")),
+            left_shoulder=left_shoulder,
+            right_shoulder=right_shoulder,
+            quality=quality,
+            measured=measured_bits,
+            **{column: min(count, 65535) for column, count in objects.items()},
+        )
+
+    def column(self, name):
+        """
+        Returns a copy of a column as a numpy array.
+        """
+        values = self.columns[name]
+        # A view would pin the array's buffer and make further appends fail, so the column is copied
+        return np.frombuffer(values, dtype=values.typecode).copy() if len(values) else np.array([], dtype=values.typecode)
+
+    def extend(self, other):
+        """
+        Appends every row of another timeline.
+        """
+        for name, _ in self.COLUMNS:
+            self.columns[name].extend(other.columns[name])
+
+    def between(self, start=None, end=None):
+        """
+        Returns a new timeline with the rows whose timestamp is in [start, end).
+        """
+        timestamps = self.column("timestamp")
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= start
+        if end is not None:
+            mask &= timestamps < end
+        return self._select(mask)
+
+    def since(self, row):
+        """
+        Returns a new timeline with the rows appended from index `row` on, e.g. the frames of one file when the
+        processor is reused across files.
+        """
+        return self._select(slice(row, None))
+
+    def _select(self, index):
+        selected = EventTimeline()
+        for name, typecode in self.COLUMNS:
+            selected.columns[name] = array(typecode, self.column(name)[index].tobytes())
+        return selected
+
+    @classmethod
+    def merge(cls, timelines):
+        """
+        Merges several timelines (e.g. of video segments) into one ordered by timestamp.
+        """
+        merged = cls()
+        for timeline in timelines:
+            merged.extend(timeline)
+        order = np.argsort(merged.column("timestamp"), kind="stable")
+        for name, typecode in cls.COLUMNS:
+            merged.columns[name] = array(typecode, merged.column(name)[order].tobytes())
+        return merged
+
+    def save(self, path):
+        """
+        Writes the timeline to a binary columnar file: a header with the row and column counts, then for each
+        column its name, array typecode and raw values.
+        """
+        with open(path, "wb") as file:
+            file.write(self.MAGIC)
+            file.write(struct.pack("<BIQ", sys.byteorder == "little", len(self.COLUMNS), len(self)))
+            for name, typecode in self.COLUMNS:
+                encoded = name.encode()
+                file.write(struct.pack("<B", len(encoded)) + encoded + typecode.encode())
+                file.write(self.columns[name].tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a timeline written by `save`.
+        """
+        timeline = cls()
+        with open(path, "rb") as file:
+            if file.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"{path} is not an event timeline file")
+            little_endian, column_count, row_count = struct.unpack("<BIQ", file.read(struct.calcsize("<BIQ")))
+            for _ in range(column_count):
+                name = file.read(struct.unpack("<B", file.read(1))[0]).decode()
+                values = array(file.read(1).decode())
+                values.frombytes(file.read(row_count * values.itemsize))
+                if bool(little_endian) != (sys.byteorder == "little"):
+                    values.byteswap()
+                timeline.columns[name] = values
+        # Files written before a column was added read as its default (or zero) in that column
+        for name, typecode in cls.COLUMNS:
+            if len(timeline.columns[name]) != row_count:
+                timeline.columns[name] = array(typecode, [cls.DEFAULTS.get(name, 0)] * row_count)
+        return timeline
+
+    def _interval_weights(self, interval):
+        timestamps = self.column("timestamp")
+        bins = ((timestamps - timestamps[0]) // interval).astype(np.int64)
+        # Each frame stands for the time until the next one; the last frame gets the median frame gap
+        durations = np.diff(timestamps, append=timestamps[-1])
+        if len(durations) > 1:
+            durations[-1] = np.median(durations[:-1])
+        else:
+            durations[-1] = 1.0
+        return timestamps[0], bins, durations
+
+    def rollup(self, name, values, interval=60.0):
+        """
+        Computes, per interval, the fraction of time a column held one of the given values, e.g.
+        `rollup("gaze", [Gaze.LEFT, Gaze.RIGHT])` for the share of each minute spent gazing away.
+
+        Args:
+            - name (str): The column name.
+            - values (int or sequence): The code(s) to count.
+            - interval (float, optional): The interval length in seconds. Defaults to 60.
+
+        Returns:
+            list: (interval_start_timestamp, fraction) tuples.
+        """
+        if len(self) == 0:
+            return []
+        start, bins, durations = self._interval_weights(interval)
+        matches = np.isin(self.column(name), np.atleast_1d(values))
+        totals = np.bincount(bins, weights=durations)
+        hits = np.bincount(bins, weights=durations * matches, minlength=len(totals))
+        return [(start + index * interval, hits[index] / totals[index])
+                for index in range(len(totals)) if totals[index] > 0]
+
+    def rollup_mean(self, name, interval=60.0):
+        """
+        Computes the time-weighted mean of a numeric column per interval, ignoring missing (NaN) values.
+
+        Returns:
+            list: (interval_start_timestamp, mean) tuples.
+        """
+        if len(self) == 0:
+            return []
+        start, bins, durations = self._interval_weights(interval)
+        values = self.column(name).astype(np.float64)
+        present = ~np.isnan(values)
+        totals = np.bincount(bins[present], weights=durations[present], minlength=bins.max() + 1)
+        sums = np.bincount(bins[present], weights=(values * durations)[present], minlength=len(totals))
+        return [(start + index * interval, sums[index] / totals[index])
+                for index in range(len(totals)) if totals[index] > 0]
+
+    def quality_changes(self):
+        """
+        Returns the frames where the load shedding level changed.
+
+        Returns:
+            list: (timestamp, previous_level, level) tuples.
+        """
+        levels = self.column("quality")
+        changed = np.flatnonzero(np.diff(levels.astype(np.int16))) + 1
+        timestamps = self.column("timestamp")
+        return [(float(timestamps[row]), int(levels[row - 1]), int(levels[row])) for row in changed]
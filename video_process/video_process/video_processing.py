@@ -1,29 +1,85 @@
 
 
 import asyncio
+import time
 from modules.voice_bot.video_process.headpose import headpose_process
 from modules.voice_bot.video_process.emotion import process_emotion
 from modules.voice_bot.video_process.eye_blink import process_blink
 from modules.voice_bot.video_process.gaze import process_gaze
 from modules.voice_bot.video_process.mouth_blink import process_mouth
 import cv2
-import dlib
 from imutils import face_utils
 from datetime import datetime
-from keras.models import load_model
-from loggers.logger import log_event
+from modules.voice_bot.video_process.log_sink import EventLogSink
 from dotenv import load_dotenv
-import keyboard
-from modules.voice_bot.video_process.detect_object import process_frame_with_yolo
-from concurrent.futures import ThreadPoolExecutor
+from modules.voice_bot.video_process.detect_object import detect_objects
 from modules.voice_bot.video_process.body_postures import body_posture
-import mediapipe as mp
-from ultralytics import YOLO
 from modules.voice_bot.video_process.detect_face import mark_attendance, known_image_encoding
+from modules.voice_bot.video_process.frame_context import FrameContext
+from modules.voice_bot.video_process.analyzer_engine import AnalyzerCall, get_default_engine
+from modules.voice_bot.video_process.model_registry import get_model_registry
+from modules.voice_bot.video_process.temporal import TemporalEvents
+from modules.voice_bot.video_process.overlay import Overlay, compose
 load_dotenv()
 
 
-async def video_processing(image, full_log_toget_bullet_pts, full_log_toget_summary,  frame_rate=30,):
+def frame_events(results):
+    """
+    Returns the per-frame events of the camera loop: the statuses of every analyzer while the candidate is present,
+    otherwise the attendance status.
+
+    Args:
+        - results (dict): The analyzer results of the frame, by analyzer name.
+
+    Returns:
+        list: The events to log for the frame.
+    """
+    _, blink_statuses = results["blink"]
+    _, gaze_directions = results["gaze"]
+    _, lip_statuses = results["mouth"]
+    _, emotion_statuses = results["emotion"]
+    _, headpose_directions = results["headpose"]
+    _, log_message, _ = results["objects"]
+    _, movement_message, _ = results["posture"]
+    log_attendance = results["attendance"]
+
+    events_to_log = []
+    for i in range(len(blink_statuses)):
+        blink_status = blink_statuses[i]
+        gaze_direction = gaze_directions[i]
+        lip_status = lip_statuses[i]
+        emotion_status = emotion_statuses[i]
+
+        if log_attendance == 'Present':
+            events_to_log.append(f"Attendance : {log_attendance}")
+            events_to_log.append(f'Headpose : {headpose_directions}')
+            if movement_message:
+                events_to_log.append(
+                    f"Body Postures:{movement_message}")
+
+            # Always append detected objects into list
+            events_to_log.append(f"Object Detected : {log_message}")
+
+            # Always add emotion status to log list
+            events_to_log.append(f"Emotion: {emotion_status}")
+
+            if blink_status == "Blinking":
+                events_to_log.append(f"Blink Status: {blink_status}")
+            if gaze_direction in ["Left", "Right"]:
+                events_to_log.append(
+                    f"Gaze Direction: {gaze_direction}")
+            if lip_status in ["Closed", "Open"]:
+                events_to_log.append(f"Mouth Status: {lip_status}")
+
+            else:  # Add this else condition to handle the case where no one is detected
+                events_to_log.append('No one detected')
+        else:
+            events_to_log.append(log_attendance)
+    return events_to_log
+
+
+async def video_processing(image, full_log_toget_bullet_pts, full_log_toget_summary,  frame_rate=30,
+                           log_transitions=False):
     """
     Process video frames captured from a camera feed using computer vision techniques.
 
@@ -32,6 +88,8 @@ async def video_processing(image, full_log_toget_bullet_pts, full_log_toget_summ
         - full_log_toget_bullet_pts (str): The file path to log the detected events to get bullet point.
         - full_log_toget_summary (str): The file path to log the detected events to get summary .
         - frame_rate (int, optional): The desired frame rate for video processing. Defaults to 30.
+        - log_transitions (bool, optional): Log only the states that start or end on each frame, with their
+          duration, instead of the statuses of every frame. Defaults to False.
 
     Code Analysis:
     - Inputs:
@@ -42,121 +100,86 @@ async def video_processing(image, full_log_toget_bullet_pts, full_log_toget_summ
 
     - Flow:
         1. Initialize the video capture from the specified camera feed.
-        2. Load the necessary models and classifiers for face detection, facial landmark detection, emotion classification, and object detection.
-        3. Create a thread pool executor to parallelize the processing of different aspects of human behavior.
+        2. Get the necessary models and classifiers for face detection, facial landmark detection, emotion classification, and object detection from the shared model registry.
+        3. Use the shared analyzer engine to parallelize the processing of different aspects of human behavior.
         4. Continuously read video frames from the camera feed.
-        5. Submit tasks to the thread pool executor for processing eye blinking, gaze direction, mouth movement, emotion, head pose, object detection, and body posture.
-        6. Combine the results of the different processing tasks into a single frame for visualization.
-        7. Log the detected events at regular intervals.
+        5. Submit tasks to the engine's worker pools for processing eye blinking, gaze direction, mouth movement, emotion, head pose, object detection, and body posture.
+        6. Draw the overlays recorded by the different processing tasks once, on a single copy of the frame.
+        7. Log the statuses of the frame, or with `log_transitions` the states that start or end on it.
         8. Display the processed frames in real-time.
         9. Terminate the video processing when the 'q' key is pressed or when Ctrl+C is detected.
 
     """
+    # Only the interactive camera loop needs these, so they are not imported with the module
+    import keyboard
+    import mediapipe as mp
+
     cap = cv2.VideoCapture(0)
     cap.set(cv2.CAP_PROP_FPS, frame_rate)
-    detector = dlib.get_frontal_face_detector()
-    lm_model = dlib.shape_predictor(
-        r'loggers/saved_models/shape_predictor_68_face_landmarks.dat')
+    # Models are loaded once per process by the registry; stateful ones are per-session instances from its pools
+    registry = get_model_registry()
+    detector = registry.acquire("detector")
+    lm_model = registry.get("landmarks")
     L_start, L_end = face_utils.FACIAL_LANDMARKS_IDXS['left_eye']
     R_start, R_end = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
-    face_classifier = cv2.CascadeClassifier(
-        r'loggers/saved_models/haarcascade_frontalface_default.xml')
-    classifier = load_model(r'loggers/saved_models/Emotion_Detection.h5')
+    classifier = registry.get("emotion")
     mp_pose = mp.solutions.pose
     mp_drawing = mp.solutions.drawing_utils
-    pose = mp_pose.Pose()
+    face_classifier = registry.acquire("face_classifier")
+    pose = registry.acquire("pose")
     # known_encoding = known_image_encoding(image_path = known_image)
-    # Load the YOLOv8 model
-    model = YOLO(r'loggers/saved_models/yolov8n.pt')
-    encoding_image = await known_image_encoding(image)
-    last_logged_time = datetime.now()
-    previous_angles = None
-    with ThreadPoolExecutor(max_workers=30) as executor:
+    model = registry.acquire("yolo")
+    log_sink = EventLogSink(full_log_toget_summary, views=[full_log_toget_bullet_pts])
+    try:
+        encoding_image = await known_image_encoding(image)
+        previous_angles = None
+        engine = get_default_engine()
+        temporal = TemporalEvents()
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
 
-            # Async processing tasks
-            task_1 = asyncio.create_task(process_blink(
-                frame.copy(), detector, lm_model, L_start, L_end, R_start, R_end))
-            task_2 = asyncio.create_task(
-                process_gaze(frame.copy(), detector, lm_model))
-            task_3 = asyncio.create_task(
-                process_mouth(frame.copy(), lm_model, detector))
-            task_4 = asyncio.create_task(process_emotion(
-                frame.copy(), face_classifier, classifier, detector))
-            task_5 = asyncio.create_task(
-                headpose_process(frame.copy(), detector, lm_model))
-            task_6 = asyncio.create_task(
-                process_frame_with_yolo(frame.copy(), model))
-            task_7 = asyncio.create_task(body_posture(
-                frame.copy(), pose, mp_drawing, mp_pose, previous_angles))
-            task_8 = asyncio.create_task(mark_attendance(
-                known_encoding=encoding_image, frame=frame.copy()
-            ))
-
-            # Gather all tasks
-            results = await asyncio.gather(task_1, task_2, task_3, task_4, task_5, task_6, task_7, task_8)
-
-            # Extract results
-            _, blink_statuses = results[0]
-            _, gaze_directions = results[1]
-            _, lip_statuses = results[2]
-            _, emotion_statuses = results[3]
-            _, headpose_directions = results[4]
-            _, log_message = results[5]
-            frame_7, movement_message, current_angles = results[6]
-            log_attendance = results[7]
-
-            combined_frame = frame_7.copy()
-
-            # Combine the results for visualization
-            events_to_log = []
-
-            for i in range(len(blink_statuses)):
-                blink_status = blink_statuses[i]
-                gaze_direction = gaze_directions[i]
-                lip_status = lip_statuses[i]
-                emotion_status = emotion_statuses[i]
-
-                if log_attendance == 'Present':
-                    events_to_log.append(f"Attendance : {log_attendance}")
-                    events_to_log.append(f'Headpose : {headpose_directions}')
-                    if movement_message:
-                        events_to_log.append(
-                            f"Body Postures:{movement_message}")
-
-                    if current_angles is not None:
-                        previous_angles = current_angles
-
-                    # always attendance
-
-                    # Always append detected objects into list
-                    events_to_log.append(f"Object Detected : {log_message}")
-
-                    # Always add emotion status to log list
-                    events_to_log.append(f"Emotion: {emotion_status}")
-
-                    if blink_status == "Blinking":
-                        events_to_log.append(f"Blink Status: {blink_status}")
-                    if gaze_direction in ["Left", "Right"]:
-                        events_to_log.append(
-                            f"Gaze Direction: {gaze_direction}")
-                    if lip_status in ["Closed", "Open"]:
-                        events_to_log.append(f"Mouth Status: {lip_status}")
-
-                    else:  # Add this else condition to handle the case where no one is detected
-                        events_to_log.append('No one detected')
-                else:
-                    events_to_log.append(log_attendance)
+            # Shared per-frame conversions, face rectangles and landmarks
+            context = FrameContext(frame, detector, lm_model)
+            await engine.run_in_thread(context.prepare)
+
+            # Analyzers share the frame read-only and record their drawing in their own overlay
+            frame.flags.writeable = False
+            overlays = {name: Overlay() for name in ("emotion", "headpose", "objects", "posture", "attendance")}
+
+            # Dispatch the analyzers to the engine's worker pools
+            results, timings = await engine.run({
+                "blink": AnalyzerCall(process_blink, frame, detector, lm_model,
+                                      L_start, L_end, R_start, R_end, context=context),
+                "gaze": AnalyzerCall(process_gaze, frame, detector, lm_model, context=context),
+                "mouth": AnalyzerCall(process_mouth, frame, lm_model, detector, context=context),
+                "emotion": AnalyzerCall(process_emotion, frame, face_classifier, classifier, detector,
+                                        context=context, overlay=overlays["emotion"]),
+                "headpose": AnalyzerCall(headpose_process, frame, detector, lm_model, context=context,
+                                         overlay=overlays["headpose"]),
+                "objects": AnalyzerCall(detect_objects, frame, model, overlay=overlays["objects"]),
+                "posture": AnalyzerCall(body_posture, frame, pose, mp_drawing, mp_pose, previous_angles,
+                                        context=context, overlay=overlays["posture"]),
+                "attendance": AnalyzerCall(mark_attendance, encoding_image, frame, context=context,
+                                           overlay=overlays["attendance"]),
+            })
+
+            _, _, current_angles = results["posture"]
+            if current_angles is not None:
+                previous_angles = current_angles
+
+            combined_frame = compose(frame, overlays.values())
+
+            if log_transitions:
+                # Only the states that started or ended on this frame are logged
+                events_to_log = temporal.update(time.time(), results)
+            else:
+                events_to_log = frame_events(results)
             current_time = datetime.now()
 
             if events_to_log:
-                # log_event(', '.join(events_to_log), filename)
-                log_event(', '.join(events_to_log), full_log_toget_bullet_pts)
-                log_event(', '.join(events_to_log), full_log_toget_summary)
-                last_logged_time = current_time
+                log_sink.emit(', '.join(events_to_log), current_time)
 
             # cv2.imshow('Combined Frame', combined_frame)
             cv2.imshow('YOLO Frame', combined_frame)
@@ -166,8 +189,15 @@ async def video_processing(image, full_log_toget_bullet_pts, full_log_toget_summ
             if keyboard.is_pressed('ctrl+c'):
                 print("Exiting due to Ctrl+C...")
                 break
+    finally:
+        # The camera, the buffered events and the pooled models are released even if the loop fails
         cap.release()
         cv2.destroyAllWindows()
+        registry.release("detector", detector)
+        registry.release("face_classifier", face_classifier)
+        registry.release("pose", pose)
+        registry.release("yolo", model)
+        await log_sink.close()
 
 
 # cam = 0,